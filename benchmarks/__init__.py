@@ -0,0 +1 @@
+"""Benchmarks for the polls application, run them with ``python -m benchmarks.<name>``."""
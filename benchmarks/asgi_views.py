@@ -0,0 +1,175 @@
+"""Benchmark of the sync against the async poll views under uvicorn.
+
+Seed a scratch database, start uvicorn once with the sync views and once
+with POLLS_ASYNC_VIEWS, and send the same requests at growing concurrency.
+Report latency percentiles, requests per second and errors per level::
+
+    pip install uvicorn
+    python -m benchmarks.asgi_views --concurrency 1,8,32,128 --requests 2000
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .scratch import percentile, seed, setup_django
+
+ENDPOINTS = ('index', 'detail', 'results', 'vote')
+
+
+def free_port():
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def login_cookies(users):
+    """Create a session for every user and return their cookie headers."""
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.sessions.backends.db import SessionStore
+
+    cookies = []
+    for user in users:
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        csrf = secrets.token_hex(16)
+        cookies.append(('sessionid={}; csrftoken={}'.format(session.session_key, csrf), csrf))
+    return cookies
+
+
+def start_server(port, environment):
+    """Start uvicorn with the environment and wait until it answer."""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'mysite.asgi:application', '--port', str(port),
+         '--log-level', 'warning', '--no-access-log'],
+        env={**os.environ, **environment})
+    for _ in range(100):
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('uvicorn did not start, is it installed?')
+
+
+def drive(port, concurrency, requests, questions, choice_map, cookies, mix):
+    """Send the requests from concurrency threads and return the samples."""
+    samples = []
+    lock = threading.Lock()
+    plan = random.Random(concurrency).choices(ENDPOINTS, mix, k=requests)
+
+    def worker(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        rand = random.Random(offset)
+        for endpoint in plan[offset::concurrency]:
+            cookie, csrf = rand.choice(cookies)
+            question = rand.choice(questions)
+            headers = {'Cookie': cookie}
+            body = None
+            method = 'GET'
+            if endpoint == 'index':
+                path = '/polls/'
+            elif endpoint == 'detail':
+                path = '/polls/{}/'.format(question.pk)
+            elif endpoint == 'results':
+                path = '/polls/{}/results/'.format(question.pk)
+            else:
+                method, path = 'POST', '/polls/{}/vote/'.format(question.pk)
+                body = 'choice={}'.format(rand.choice(choice_map[question.pk]).pk)
+                headers.update({'Content-Type': 'application/x-www-form-urlencoded', 'X-CSRFToken': csrf})
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                status = 0
+            with lock:
+                samples.append((endpoint, time.perf_counter() - start, status))
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """Return the numbers of one run."""
+    latencies = sorted(sample[1] for sample in samples)
+    return {
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'errors': sum(1 for sample in samples if not 200 <= sample[2] < 400),
+    }
+
+
+def main():
+    """Parse the options, run both modes and print the JSON report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='1,8,32,128')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--choices', type=int, default=4)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--mix', default='4,1,4,1', help='Weights of index, detail, results and vote.')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+    options = parser.parse_args()
+    levels = [int(level) for level in options.concurrency.split(',')]
+    mix = [float(weight) for weight in options.mix.split(',')]
+
+    report = {'options': vars(options), 'modes': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.sqlite3')
+        # Persistent connections are not reused across async requests, keep them off.
+        # Every request come from one address, so the rate limits are off too.
+        environment = {'ALLOWED_HOSTS': '127.0.0.1', 'CONN_MAX_AGE': '0', 'POLLS_THROTTLE': 'False'}
+        setup_django(database, environment)
+        questions, choice_map, users = seed(options.questions, options.choices, options.users)
+        cookies = login_cookies(users)
+
+        for mode, async_views in (('sync', 'False'), ('async', 'True')):
+            port = free_port()
+            server = start_server(port, {**environment, 'DATABASE_URL': 'sqlite:///{}'.format(database),
+                                         'POLLS_ASYNC_VIEWS': async_views})
+            try:
+                report['modes'][mode] = {
+                    str(level): summarize(*drive(port, level, options.requests, questions, choice_map,
+                                                 cookies, mix))
+                    for level in levels
+                }
+            finally:
+                server.terminate()
+                server.wait()
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark of the session engines and of logins next to votes.
+
+Run it once per profile and compare the JSON reports::
+
+    python -m benchmarks.auth --session db
+    python -m benchmarks.auth --session cached_db
+    python -m benchmarks.auth --session signed_cookies
+    python -m benchmarks.auth --session cached_db --pool 2
+
+The 'pages' numbers are logged in users opening the vote page, they show
+what the session engine cost on every request. The 'storm' numbers are
+logins with the real password hasher while other threads vote, they show
+how much a login spike slow the votes with and without the hashing pool.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from .scratch import percentile, seed, setup_django
+
+
+def summarize(samples):
+    """Return the latency and query numbers of samples of (seconds, queries, status)."""
+    latencies = sorted(sample[0] for sample in samples)
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'queries_per_request': round(sum(sample[1] for sample in samples) / max(1, len(samples)), 2),
+        'errors': sum(1 for sample in samples if sample[2] >= 400),
+    }
+
+
+def timed(client, method, path, data=None):
+    """Send one request and return (seconds, queries, status)."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = getattr(client, method)(path, data)
+        elapsed = time.perf_counter() - start
+    return elapsed, len(queries), response.status_code
+
+
+def run_threads(targets):
+    """Run the functions in threads and wait for all of them."""
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def pages(questions, users, threads, requests):
+    """Open the vote page as logged in users."""
+    from django.db import close_old_connections
+    from django.test import Client
+    from django.urls import reverse
+
+    samples = []
+
+    def worker(offset):
+        rand = random.Random(offset)
+        clients = []
+        for user in users[offset::threads][:10]:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        for _ in range(requests // threads):
+            path = reverse('polls:detail', args=(rand.choice(questions).pk,))
+            samples.append(timed(rand.choice(clients), 'get', path))
+        close_old_connections()
+
+    run_threads([lambda offset=offset: worker(offset) for offset in range(threads)])
+    return summarize(samples)
+
+
+def storm(questions, choice_map, users, logins, voters, requests):
+    """Log in from logins threads while voters threads vote."""
+    from django.db import close_old_connections
+    from django.test import Client
+    from django.urls import reverse
+
+    login_samples, vote_samples = [], []
+
+    def login_worker(offset):
+        for user in users[offset::logins][:requests // logins]:
+            login_samples.append(timed(Client(), 'post', reverse('polls:login'),
+                                       {'username': user.username, 'password': 'secret'}))
+        close_old_connections()
+
+    def vote_worker(offset):
+        rand = random.Random(offset)
+        client = Client()
+        client.force_login(users[-1 - offset])
+        for _ in range(requests // voters):
+            question = rand.choice(questions)
+            vote_samples.append(timed(client, 'post', reverse('polls:vote', args=(question.pk,)),
+                                      {'choice': rand.choice(choice_map[question.pk]).pk}))
+        close_old_connections()
+
+    run_threads([lambda offset=offset: login_worker(offset) for offset in range(logins)]
+                + [lambda offset=offset: vote_worker(offset) for offset in range(voters)])
+    return {'login': summarize(login_samples), 'vote': summarize(vote_samples)}
+
+
+def main():
+    """Parse the options, run both phases and print the JSON report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--session', default='db', choices=['db', 'cached_db', 'cache', 'signed_cookies'])
+    parser.add_argument('--hasher', default='default', choices=['default', 'fast'])
+    parser.add_argument('--pool', type=int, default=0, help='Size of the hashing pool, 0 for none.')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--logins', type=int, default=8, help='Threads logging in during the storm.')
+    parser.add_argument('--voters', type=int, default=4, help='Threads voting during the storm.')
+    parser.add_argument('--login-requests', type=int, default=200)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Every request come from one address, turn the rate limits off.
+        setup_django(os.path.join(directory, 'bench.sqlite3'), {
+            'ALLOWED_HOSTS': 'testserver',
+            'POLLS_THROTTLE': 'False',
+            'SESSION_PROFILE': options.session,
+            'PASSWORD_HASHER_PROFILE': options.hasher,
+            'POLLS_HASHING_POOL_SIZE': str(options.pool),
+        })
+        from django.contrib.auth.hashers import make_password
+        from django.contrib.auth.models import User
+
+        questions, choice_map, users = seed(20, 4, max(options.login_requests, 100) + options.voters)
+        User.objects.update(password=make_password('secret'))
+        # Reload, the session hash of force_login come from the password.
+        users = list(User.objects.filter(pk__in=[user.pk for user in users]).order_by('pk'))
+        report = {
+            'options': vars(options),
+            'pages': pages(questions, users, options.threads, options.requests),
+            'storm': storm(questions, choice_map, users, options.logins, options.voters, options.login_requests),
+        }
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Load test of the voting, results, index and detail pages.
+
+Seed a scratch database with questions, choices and users, then drive the
+pages through the Django test client from threads and report latency
+percentiles, requests per second and queries per request::
+
+    python -m benchmarks.load --questions 100 --choices 5 --users 1000 \\
+        --requests 5000 --threads 8 --mix vote=1,results=4,index=4,detail=1 \\
+        --output bench.json
+
+Keep the JSON of each run to compare the numbers across commits.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+
+from .scratch import percentile, seed, setup_django
+
+ENDPOINTS = ('vote', 'results', 'index', 'detail')
+
+
+def parse_mix(mix):
+    """Return the endpoint weights of a mix like 'vote=1,results=4'."""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError('Unknown endpoint {!r}.'.format(name))
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def git_commit():
+    """Return the current git commit or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class LoadWorker(threading.Thread):
+    """Thread that send its share of the requests as random users."""
+
+    def __init__(self, plan, questions, choice_map, users, seed_value):
+        """Set up the worker with the endpoints it must request."""
+        super().__init__()
+        self.plan = plan
+        self.questions = questions
+        self.choice_map = choice_map
+        self.users = users
+        self.random = random.Random(seed_value)
+        self.clients = {}
+        self.samples = []
+
+    def client(self, user):
+        """Return a test client logged in as user."""
+        from django.test import Client
+        if user.pk not in self.clients:
+            client = Client()
+            client.force_login(user)
+            self.clients[user.pk] = client
+        return self.clients[user.pk]
+
+    def request(self, client, endpoint):
+        """Send one request to endpoint and return the response."""
+        from django.urls import reverse
+        question = self.random.choice(self.questions)
+        if endpoint == 'vote':
+            choice = self.random.choice(self.choice_map[question.pk])
+            return client.post(reverse('polls:vote', args=(question.pk,)), {'choice': choice.pk})
+        if endpoint == 'results':
+            return client.get(reverse('polls:results', args=(question.pk,)))
+        if endpoint == 'detail':
+            return client.get(reverse('polls:detail', args=(question.pk,)))
+        return client.get(reverse('polls:index'))
+
+    def run(self):
+        """Send every planned request and record latency and queries."""
+        from django.db import connection, close_old_connections
+        from django.test.utils import CaptureQueriesContext
+
+        for endpoint in self.plan:
+            # Log in before the clock start, logging in is not part of the load.
+            client = self.client(self.random.choice(self.users))
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.request(client, endpoint)
+                elapsed = time.perf_counter() - start
+            self.samples.append((endpoint, elapsed, len(queries), response.status_code))
+        close_old_connections()
+
+
+def summarize(samples, elapsed):
+    """Return the latency, throughput and query numbers of each endpoint."""
+    report = {}
+    for endpoint in ENDPOINTS:
+        rows = [sample for sample in samples if sample[0] == endpoint]
+        if not rows:
+            continue
+        latencies = sorted(row[1] for row in rows)
+        report[endpoint] = {
+            'requests': len(rows),
+            'requests_per_second': round(len(rows) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries_per_request': round(sum(row[2] for row in rows) / len(rows), 2),
+            'errors': sum(1 for row in rows if row[3] >= 400),
+        }
+    return report
+
+
+def run(options):
+    """Seed the database, send the requests and return the report."""
+    questions, choice_map, users = seed(options.questions, options.choices, options.users)
+    weights = parse_mix(options.mix)
+    plan = random.Random(options.seed).choices(list(weights), list(weights.values()), k=options.requests)
+    workers = [LoadWorker(plan[number::options.threads], questions, choice_map, users, options.seed + number)
+               for number in range(options.threads)]
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    samples = [sample for worker in workers for sample in worker.samples]
+    return {
+        'commit': git_commit(),
+        'options': vars(options),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'endpoints': summarize(samples, elapsed),
+    }
+
+
+def main():
+    """Parse the options, run the load test and write the JSON report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--choices', type=int, default=4)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--mix', default='vote=1,results=4,index=4,detail=1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+    options = parser.parse_args()
+    parse_mix(options.mix)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Every request come from one address, turn the rate limits off.
+        setup_django(os.path.join(directory, 'bench.sqlite3'),
+                     {'ALLOWED_HOSTS': 'testserver', 'POLLS_THROTTLE': 'False'})
+        report = run(options)
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
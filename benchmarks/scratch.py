@@ -0,0 +1,55 @@
+"""Scratch database and seed data shared by the benchmarks."""
+import datetime
+import os
+
+
+def setup_django(database, environment=None):
+    """Point the settings at the scratch SQLite database, set up Django and migrate.
+
+    Args:
+        database: path of the scratch database file.
+        environment: extra environment variables read by the settings.
+    """
+    os.environ['DATABASE_URL'] = 'sqlite:///{}'.format(database)
+    os.environ.update(environment or {})
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed(questions, choices, users):
+    """Create open questions with choices and the voting users.
+
+    Returns:
+        Tuple of the lists of questions, choices of each question id and users.
+    """
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from polls.models import Question, Choice
+
+    now = timezone.now()
+    Question.objects.bulk_create([
+        Question(question_text='Benchmark question {}'.format(number),
+                 pub_date=now - datetime.timedelta(days=1, minutes=number),
+                 end_date=now + datetime.timedelta(days=1))
+        for number in range(questions)
+    ])
+    question_list = list(Question.objects.order_by('pk'))
+    Choice.objects.bulk_create([
+        Choice(question=question, choice_text='Choice {}'.format(number))
+        for question in question_list for number in range(choices)
+    ])
+    choice_map = {}
+    for choice in Choice.objects.order_by('pk'):
+        choice_map.setdefault(choice.question_id, []).append(choice)
+    User.objects.bulk_create([User(username='bench{}'.format(number)) for number in range(users)])
+    return question_list, choice_map, list(User.objects.filter(username__startswith='bench').order_by('pk'))
+
+
+def percentile(ordered, fraction):
+    """Return the value at fraction of the sorted list, 0 for an empty list."""
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
@@ -0,0 +1,169 @@
+"""Benchmark of the worker start: import time, URLconf load and first requests.
+
+Each run start a fresh interpreter with ``python -X importtime``, so
+nothing is imported yet, and report the time of each start phase, the
+import time of each package and of the slowest modules, and the latency
+of the first and second request of each page::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --lean --runs 5
+
+--lean start with the vote-only URLconf (POLLS_LEAN_URLS). The scratch
+database is migrated and seeded between the URLconf and the requests,
+its imports and time are left out of the report.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+PHASE_MARK = 'startup phase: '
+
+
+def mark(phase):
+    """Write the phase mark between the import time lines of the child."""
+    sys.stderr.write(PHASE_MARK + phase + '\n')
+    sys.stderr.flush()
+
+
+def elapsed_ms(start):
+    """Return the milliseconds since start."""
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def child():
+    """Start Django in this fresh interpreter and print the timings as JSON."""
+    phases = {}
+    mark('setup')
+    start = time.perf_counter()
+    import django
+    django.setup()
+    phases['setup_ms'] = elapsed_ms(start)
+
+    mark('urls')
+    start = time.perf_counter()
+    from django.urls import get_resolver, reverse
+    get_resolver().url_patterns
+    phases['urls_ms'] = elapsed_ms(start)
+
+    mark('scratch')
+    from django.core.management import call_command
+    from django.test import Client
+    from .scratch import seed
+    call_command('migrate', verbosity=0)
+    questions, choice_map, users = seed(3, 2, 1)
+    question = questions[0]
+
+    mark('requests')
+    client = Client()
+    client.force_login(users[0])
+    vote_data = {'choice': choice_map[question.pk][0].pk}
+    pages = [
+        ('login', Client(), 'get', reverse('polls:login'), None),
+        ('index', client, 'get', reverse('polls:index'), None),
+        ('detail', client, 'get', reverse('polls:detail', args=(question.pk,)), None),
+        ('vote', client, 'post', reverse('polls:vote', args=(question.pk,)), vote_data),
+        ('results', client, 'get', reverse('polls:results', args=(question.pk,)), None),
+    ]
+    requests = {}
+    for name, page_client, method, path, data in pages:
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            response = getattr(page_client, method)(path, data)
+            timings.append(elapsed_ms(start))
+        requests[name] = {'first_ms': timings[0], 'second_ms': timings[1], 'status': response.status_code}
+    mark('done')
+    print(json.dumps({'phases': phases, 'requests': requests}))
+
+
+def parse_importtime(stderr):
+    """Return the import time of each phase, package and module from the -X importtime lines.
+
+    Returns:
+        Tuple of Counter of microseconds per phase, per top level package and per module.
+    """
+    phase = 'interpreter'
+    phases, packages, modules = Counter(), Counter(), Counter()
+    for line in stderr.splitlines():
+        if line.startswith(PHASE_MARK):
+            phase = line[len(PHASE_MARK):]
+            continue
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        phases[phase] += int(self_us)
+        if phase != 'scratch':
+            packages[name.split('.')[0]] += int(self_us)
+            modules[name] += int(self_us)
+    return phases, packages, modules
+
+
+def run_once(lean, directory):
+    """Run the child in a fresh interpreter and return its report and the import times."""
+    environment = dict(os.environ)
+    environment.update({
+        'DJANGO_SETTINGS_MODULE': 'mysite.settings',
+        'DATABASE_URL': 'sqlite:///{}'.format(os.path.join(directory, 'startup.sqlite3')),
+        'ALLOWED_HOSTS': 'testserver',
+        'POLLS_THROTTLE': 'False',
+        'POLLS_LEAN_URLS': str(lean),
+    })
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'benchmarks.startup', '--child'],
+                            cwd=root, env=environment, capture_output=True, text=True, check=True)
+    os.remove(os.path.join(directory, 'startup.sqlite3'))
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def median(values):
+    """Return the median of values rounded to 0.01."""
+    return round(statistics.median(values), 2)
+
+
+def main():
+    """Parse the options, run the fresh interpreters and print the JSON report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lean', action='store_true', help='Start with the vote-only URLconf.')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters to start, the medians are reported.')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to report.')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.child:
+        child()
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [run_once(options.lean, directory) for _ in range(options.runs)]
+    reports = [report for report, _ in runs]
+    phases, packages, modules = runs[0][1]
+    report = {
+        'options': vars(options),
+        'phases': {name: median([run['phases'][name] for run in reports]) for name in reports[0]['phases']},
+        'requests': {
+            name: {key: median([run['requests'][name][key] for run in reports]) for key in ('first_ms', 'second_ms')}
+            for name in reports[0]['requests']
+        },
+        'import_ms': {
+            'phases': {name: round(us / 1000, 2) for name, us in phases.items() if name != 'scratch'},
+            'packages': {name: round(us / 1000, 2) for name, us in packages.most_common(options.top)},
+            'slowest_modules': {name: round(us / 1000, 2) for name, us in modules.most_common(options.top)},
+        },
+    }
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
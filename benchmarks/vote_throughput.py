@@ -0,0 +1,94 @@
+"""Benchmark of concurrent vote throughput on a scratch SQLite database.
+
+Run it once per database profile and compare the votes per second::
+
+    python -m benchmarks.vote_throughput --profile default
+    python -m benchmarks.vote_throughput --profile tuned
+
+The 'default' profile is a plain SQLite connection per vote, the 'tuned'
+profile is WAL, busy_timeout and the other POLLS_SQLITE_PRAGMAS with
+persistent connections.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .scratch import percentile, seed, setup_django
+
+PROFILES = {
+    'default': {'SQLITE_TUNING': 'False', 'CONN_MAX_AGE': '0'},
+    'tuned': {'SQLITE_TUNING': 'True', 'CONN_MAX_AGE': '600'},
+}
+
+
+def run(threads, votes, users, choices):
+    """Cast votes from threads and return the measured numbers."""
+    from django.db import OperationalError, close_old_connections
+    from polls.models import Vote
+    from polls.voting import cast_vote
+
+    questions, choice_map, user_list = seed(1, choices, users)
+    question, choice_list = questions[0], choice_map[questions[0].pk]
+    errors = []
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        for number in range(offset, votes, threads):
+            user = user_list[number % len(user_list)]
+            choice = choice_list[number % len(choice_list)]
+            start = time.perf_counter()
+            try:
+                cast_vote(question, user, choice)
+            except OperationalError as error:
+                with lock:
+                    errors.append(str(error))
+            finally:
+                # The end of a request, close the connection unless CONN_MAX_AGE keep it.
+                close_old_connections()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=worker, args=(offset,)) for offset in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'votes': votes,
+        'threads': threads,
+        'seconds': round(elapsed, 3),
+        'votes_per_second': round(votes / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'errors': len(errors),
+        'stored_votes': Vote.objects.count(),
+    }
+
+
+def main():
+    """Parse the options, run the benchmark and print the result as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='tuned')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--votes', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--choices', type=int, default=4)
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'), PROFILES[options.profile])
+        result = run(options.threads, options.votes, options.users, options.choices)
+    result['profile'] = options.profile
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""Settings of the test run, mysite.settings with the test-only databases and hashers.
+
+manage.py test select this module unless DJANGO_SETTINGS_MODULE is set,
+other runners set DJANGO_SETTINGS_MODULE=mysite.settings_test.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, PASSWORD_HASHER_PROFILES
+
+# Second SQLite database standing in for a replica in the routing tests.
+DATABASES.setdefault('replica', {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3'})
+
+# MD5 keep the many test logins fast, never use it outside of the tests.
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES['fast']
+
+# The test run is one process, the local memory cache is shared by all of it.
+SILENCED_SYSTEM_CHECKS = ['polls.W001']
@@ -0,0 +1,14 @@
+"""mysite URL Configuration of the vote workers, selected with POLLS_LEAN_URLS.
+
+The same as mysite.urls without the admin site. The admin app is not
+installed in this mode either, so django.setup() import none of the
+admin modules and a new worker answer its first vote sooner.
+"""
+from django.urls import path, include
+from . import views
+
+
+urlpatterns = [
+    path('', views.index, name='main_index'),
+    path('polls/', include('polls.urls')),
+]
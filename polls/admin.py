@@ -1,7 +1,16 @@
 """Module to manage the admin page."""
 from django.contrib import admin
+from django.db.models import Count
 
-from .models import Question, Choice
+from .models import Question, Choice, Vote
+from .pagination import EstimatedCountPaginator
+
+
+def _save_without(obj, fields):
+    """Save the changed obj without writing fields, so the values written meanwhile by the votes are kept."""
+    deferred = obj.get_deferred_fields()
+    obj.save(update_fields=[field.name for field in obj._meta.concrete_fields
+                            if not field.primary_key and field.name not in fields and field.attname not in deferred])
 
 
 class ChoiceInline(admin.TabularInline):
@@ -9,6 +18,8 @@ class ChoiceInline(admin.TabularInline):
 
     model = Choice
     extra = 3
+    # The tally is only written by the voting module.
+    readonly_fields = ['votes']
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -21,9 +32,81 @@ class QuestionAdmin(admin.ModelAdmin):
     ]
     inlines = [ChoiceInline]
     list_display = ('question_text', 'pub_date', 'end_date',
-                    'was_published_recently')
+                    'was_published_recently', 'choice_count', 'total_votes')
     list_filter = ['pub_date']
-    search_fields = ['question_text']
+    # Case insensitive prefix search, backed by question_text_prefix_idx.
+    search_fields = ['^question_text']
+    search_help_text = 'Questions starting with the text.'
+
+    def save_model(self, request, obj, form, change):
+        """Save the question without the vote total and the results snapshot, they are written by the votes."""
+        if change:
+            _save_without(obj, {'total_votes', 'final_results'})
+        else:
+            obj.save()
+
+    def save_formset(self, request, form, formset, change):
+        """Save the choices without their tally, it is written by the votes."""
+        for obj in formset.save(commit=False):
+            if obj._state.adding:
+                obj.save()
+            else:
+                _save_without(obj, {'votes'})
+        for obj in formset.deleted_objects:
+            obj.delete()
+        formset.save_m2m()
+
+    def get_queryset(self, request):
+        """Annotate the number of choices and the vote tally with its counter shards."""
+        return (super().get_queryset(request).defer('final_results').with_tally()
+                .annotate(choice_count=Count('choice')))
+
+    def choice_count(self, obj):
+        """Return the number of choices of the question."""
+        return obj.choice_count
+    choice_count.admin_order_field = 'choice_count'
+    choice_count.short_description = 'Choices'
+
+    def total_votes(self, obj):
+        """Return the votes of the question, with the counter shards not compacted yet."""
+        return obj.tally
+    total_votes.admin_order_field = 'tally'
+    total_votes.short_description = 'Total votes'
+
+
+class VoteAdmin(admin.ModelAdmin):
+    """In the admin page display the votes, without loading or counting the whole table.
+
+    The votes are read-only: a vote written here would skip cast_vote, so
+    the tallies, the event log and the cached results would not follow it.
+    """
+
+    list_display = ('id', 'question', 'choice', 'user', 'cast_at')
+    list_select_related = ('question', 'choice', 'user')
+    raw_id_fields = ('question', 'choice', 'user')
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Exact match on the unique index of the username.
+    search_fields = ['user__username__exact']
+    search_help_text = 'Votes of the user with this exact username.'
+
+    def get_queryset(self, request):
+        """Leave out the results snapshot of the related question."""
+        return super().get_queryset(request).defer('question__final_results')
+
+    def has_add_permission(self, request):
+        """Votes are only cast through the poll pages."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Votes are only switched through the poll pages."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Votes are never deleted alone, the tallies would keep them."""
+        return False
 
 
 admin.site.register(Question, QuestionAdmin)
+admin.site.register(Vote, VoteAdmin)
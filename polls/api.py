@@ -0,0 +1,134 @@
+"""Module for the JSON read API of the polls.
+
+The payloads are serialized from .values() rows without building model
+instances. Each response carry an ETag made of the versions kept in the
+cache, so a client sending it back in If-None-Match get a 304 before any
+query runs, and the JSON is gzipped for clients that accept it. Like the
+cached pages, the versioned payloads are read from the primary.
+"""
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
+
+from .caching import (catalog_state, final_since, get_results, is_final, patch_final_headers, question_version,
+                      question_window, served_results_version, timeline_version)
+from .events import HOUR, MINUTE, vote_timeline
+from .models import Question, Choice
+from .pagination import keyset_values
+
+QUESTION_FIELDS = ('id', 'question_text', 'pub_date', 'end_date')
+
+
+def _json(data):
+    """Return data as compact JSON."""
+    return JsonResponse(data, encoder=DjangoJSONEncoder, json_dumps_params={'separators': (',', ':')})
+
+
+def _etag(*parts):
+    """Return the ETag made of parts."""
+    return '"{}"'.format('-'.join(str(part) for part in parts))
+
+
+def _list_etag(request):
+    """Return the ETag of the question list, it change when a question is saved, opens or closes."""
+    return _etag('list', catalog_state(), request.GET.urlencode())
+
+
+def _question_etag(request, pk):
+    """Return the ETag of the question, it also change when one of its choices is saved."""
+    return _etag('question', pk, question_version(pk), catalog_state())
+
+
+def _results_etag(request, pk):
+    """Return the ETag of the results, it change with the served results and once they are final.
+
+    None for a question that is not published, so it is never answered with a 304.
+    """
+    window = question_window(pk)
+    now = timezone.now()
+    if window is None or window[0] > now:
+        return None
+    return _etag('results', pk, served_results_version(pk), 'final' if final_since(window[1]) <= now else 'open')
+
+
+def _timeline_etag(request, pk):
+    """Return the ETag of the vote timeline, it change when its buckets are rolled up and once the poll is final.
+
+    None for an unknown question, so it is never answered with a 304.
+    """
+    window = question_window(pk)
+    if window is None:
+        return None
+    final = 'final' if final_since(window[1]) <= timezone.now() else 'open'
+    return _etag('timeline', pk, timeline_version(pk), final, request.GET.urlencode())
+
+
+@gzip_page
+@require_GET
+@condition(etag_func=_list_etag)
+def question_list(request):
+    """Return one page of the published questions, newest first.
+
+    ``after`` is the cursor of the page, given as ``next`` with the
+    previous page, and ``open=1`` keep only the questions that can be voted now.
+    """
+    questions = Question.objects.using(DEFAULT_DB_ALIAS)
+    questions = questions.open() if request.GET.get('open') else questions.published()
+    page_size = getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20)
+    page, next_cursor = keyset_values(questions, QUESTION_FIELDS, request.GET.get('after'), page_size)
+    return _json({'questions': page, 'next': next_cursor})
+
+
+@gzip_page
+@require_GET
+@condition(etag_func=_question_etag)
+def question_detail(request, pk):
+    """Return the published question with its choices."""
+    question = Question.objects.using(DEFAULT_DB_ALIAS).published().filter(pk=pk).values(*QUESTION_FIELDS).first()
+    if question is None:
+        raise Http404('No question found.')
+    choices = Choice.objects.using(DEFAULT_DB_ALIAS).filter(question_id=pk).order_by('pk')
+    question['choices'] = list(choices.values('id', 'choice_text'))
+    return _json(question)
+
+
+@gzip_page
+@require_GET
+@condition(etag_func=_results_etag)
+def question_results(request, pk):
+    """Return the votes of each choice of the published question, ``final`` once they can no longer change."""
+    question = get_object_or_404(Question.objects.published().only('end_date', 'final_results'), pk=pk)
+    final = is_final(question)
+    response = _json({'id': question.pk, 'final': final, 'results': get_results(question)})
+    if final:
+        patch_final_headers(response, question)
+    return response
+
+
+@gzip_page
+@require_GET
+@condition(etag_func=_timeline_etag)
+def question_timeline(request, pk):
+    """Return the votes over time of each choice, read from the vote buckets only.
+
+    ``resolution`` is 'hour' (default) or 'minute', the minutes are kept
+    until the poll closed. The buckets are written by the materialize_votes
+    command, without it the timeline stay empty.
+    """
+    sizes = {'minute': MINUTE, 'hour': HOUR}
+    resolution = request.GET.get('resolution', 'hour')
+    if resolution not in sizes:
+        return HttpResponseBadRequest('resolution must be minute or hour.')
+    window = question_window(pk)
+    if window is None:
+        raise Http404('No question found.')
+    question = Question(pk=pk, pub_date=window[0], end_date=window[1])
+    response = _json({'id': pk, 'resolution': resolution, 'buckets': vote_timeline(pk, sizes[resolution])})
+    if is_final(question):
+        patch_final_headers(response, question)
+    return response
@@ -6,3 +6,7 @@ class PollsConfig(AppConfig):
     """The app configuration."""
 
     name = 'polls'
+
+    def ready(self):
+        """Connect the signal receivers and register the system checks."""
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,113 @@
+"""Module for the async versions of the poll views, for ASGI deployments.
+
+They read with the async ORM and the async cache calls, so a request does
+not hop to the sync thread for its queries. Writing a vote need a
+transaction, which the async ORM does not have, so only that call run in
+sync_to_async. Turn them on with POLLS_ASYNC_VIEWS.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db.models import Prefetch
+from django.http import HttpResponseRedirect
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+from django.views import generic
+
+from .caching import aget_results, is_final, patch_final_headers
+from .models import Question, Choice
+from .fragments import aquestion_list
+from .live import live_options
+from .queue import aenqueue_vote, ingestion_mode
+from .throttling import aforget_vote, ais_duplicate_vote, throttle
+from .voting import cast_vote
+
+logger = logging.getLogger(__name__)
+
+
+async def _resolve_user(request):
+    """Load request.user with the async ORM, so the template does not touch the database."""
+    request.user = await request.auser()
+    return request.user
+
+
+class IndexView(generic.View):
+    """Async version of the index page."""
+
+    async def get(self, request):
+        """Render one page of published questions."""
+        await _resolve_user(request)
+        open_only = bool(request.GET.get('open'))
+        list_html = await aquestion_list(open_only, request.GET.get('after'))
+        # The messages are kept in the session, load them before rendering.
+        await sync_to_async(len)(messages.get_messages(request))
+        return render(request, 'polls/index.html', {'question_list': list_html, 'open_only': open_only})
+
+
+class DetailView(generic.View):
+    """Async version of the vote page."""
+
+    async def get(self, request, pk):
+        """Render the published question with its choices."""
+        await _resolve_user(request)
+        choices = Prefetch('choice_set', queryset=Choice.objects.order_by('pk'))
+        question = await aget_object_or_404(
+            Question.objects.published().prefetch_related(choices), pk=pk)
+        return render(request, 'polls/detail.html', {'question': question})
+
+
+class ResultsView(generic.View):
+    """Async version of the result page."""
+
+    async def get(self, request, pk):
+        """Render the cached results of the question, cacheable once the poll closed."""
+        question = await aget_object_or_404(Question, pk=pk)
+        results = await aget_results(question)
+        final = is_final(question)
+        live = live_options()['ENABLED'] and not final
+        response = render(request, 'polls/results.html', {'question': question, 'results': results, 'final': final,
+                                                          'live': live})
+        if final:
+            patch_final_headers(response, question)
+        return response
+
+
+@throttle('vote')
+async def vote(request, question_id):
+    """Async version of polls.views.vote.
+
+    Returns: Result page if the choice has check, otherwise detail page.
+    """
+    user = await _resolve_user(request)
+    if await ais_duplicate_vote(request, question_id):
+        return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
+    try:
+        # The choice and its question in one query.
+        select_choice = await (Choice.objects.select_related('question').defer('question__final_results')
+                               .aget(pk=request.POST['choice'], question_id=question_id))
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        select_choice = None
+        question = await aget_object_or_404(Question.objects.prefetch_related('choice_set'), pk=question_id)
+    else:
+        question = select_choice.question
+    if not question.can_vote():
+        await aforget_vote(request, question_id)
+        await sync_to_async(messages.error)(request, "This poll was not in the polling period.")
+        return redirect('polls:index')
+    if select_choice is None:
+        await aforget_vote(request, question_id)
+        return render(request, 'polls/detail.html', {'question': question,
+                                                     'error_message': "You didn't select a choice."})
+
+    try:
+        if ingestion_mode() != 'sync':
+            await aenqueue_vote(question, user, select_choice)
+            logger.info('Vote queued: Vote as {} at {}'.format(user.username, request.META.get('REMOTE_ADDR')))
+        elif await sync_to_async(cast_vote)(question, user, select_choice):
+            logger.info('Vote success: Vote as {} at {}'.format(user.username, request.META.get('REMOTE_ADDR')))
+    except Exception:
+        # The vote was not written, a retry must not be taken for a repeat.
+        await aforget_vote(request, question_id)
+        raise
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
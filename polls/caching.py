@@ -0,0 +1,461 @@
+"""Module for caching the poll results in the Django cache framework."""
+import asyncio
+import datetime
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+
+from .metrics import record_cache
+from .models import Question, Choice
+
+VERSION_KEY = 'polls:results:version:{}'
+RESULTS_KEY = 'polls:results:{}:{}'
+MODIFIED_KEY = 'polls:results:modified:{}'
+CATALOG_KEY = 'polls:catalog:version'
+QUESTION_KEY = 'polls:question:version:{}'
+WINDOW_KEY = 'polls:question:window:{}:{}'
+TRANSITION_KEY = 'polls:catalog:transition'
+TIMELINE_KEY = 'polls:timeline:version:{}'
+
+DEFAULT_CLOSED_RESULTS_OPTIONS = {
+    'GRACE': 60,
+    'MAX_AGE': 86400,
+    'ARCHIVE_AFTER': 30,
+}
+
+
+def results_mode():
+    """Return the results cache mode.
+
+    Returns:
+        'version' to invalidate the results on every vote, 'ttl' to let them expire.
+    """
+    return getattr(settings, 'POLLS_RESULTS_CACHE_MODE', 'version')
+
+
+def results_timeout():
+    """Return how many seconds the results stay in the cache."""
+    return getattr(settings, 'POLLS_RESULTS_CACHE_TIMEOUT', 300)
+
+
+def results_version(question_id):
+    """Return the current results version of the question.
+
+    A missing version start from the current time, so it never match
+    results that were cached before the version was evicted.
+    """
+    key = VERSION_KEY.format(question_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+async def aresults_version(question_id):
+    """Async version of results_version."""
+    key = VERSION_KEY.format(question_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def bump_results_version(question_id):
+    """Mark the results of the question as changed.
+
+    The version and the time of the change are also used for the ETag and
+    Last-Modified of the results export. In 'ttl' mode the cached results
+    do not depend on the version, they expire after the timeout.
+
+    Returns:
+        The new version.
+    """
+    try:
+        version = cache.incr(VERSION_KEY.format(question_id))
+    except ValueError:
+        version = time.time_ns()
+        cache.set(VERSION_KEY.format(question_id), version, None)
+    cache.set(MODIFIED_KEY.format(question_id), timezone.now(), None)
+    return version
+
+
+def results_last_modified(question_id):
+    """Return when the results of the question last changed, None if unknown."""
+    return cache.get(MODIFIED_KEY.format(question_id))
+
+
+def served_results_version(question_id):
+    """Return the results version the ETag of the served results is built from.
+
+    In 'ttl' mode the served results are the cached ones until they expire,
+    so this is the version stored with them, not the current one.
+    """
+    if results_mode() == 'ttl':
+        entry = cache.get(RESULTS_KEY.format(question_id, 'ttl'))
+        if entry is not None:
+            return entry[0]
+    return results_version(question_id)
+
+
+def _ttl_results(question):
+    """Return the results cached in 'ttl' mode, counted with the version read before them."""
+    key = RESULTS_KEY.format(question.pk, 'ttl')
+    entry = cache.get(key)
+    record_cache(entry is not None)
+    if entry is None:
+        entry = (results_version(question.pk), [_result(row) for row in _results_queryset(question)])
+        cache.set(key, entry, results_timeout())
+    return entry[1]
+
+
+async def _attl_results(question):
+    """Async version of _ttl_results."""
+    key = RESULTS_KEY.format(question.pk, 'ttl')
+    entry = await cache.aget(key)
+    record_cache(entry is not None)
+    if entry is None:
+        entry = (await aresults_version(question.pk), [_result(row) async for row in _results_queryset(question)])
+        await cache.aset(key, entry, results_timeout())
+    return entry[1]
+
+
+def _results_queryset(question):
+    """Return the query of the results of the question.
+
+    In 'version' mode the results are read from the primary: a lagging
+    replica would store old tallies under the new version until the next vote.
+    """
+    queryset = Choice.objects.filter(question=question)
+    if results_mode() == 'version':
+        queryset = queryset.using(DEFAULT_DB_ALIAS)
+    return queryset.with_tally().order_by('pk').values_list('id', 'choice_text', 'tally')
+
+
+def _result(row):
+    """Return the dict of one row of _results_queryset."""
+    return {'id': row[0], 'choice_text': row[1], 'votes': row[2]}
+
+
+def closed_results_options():
+    """Return the closed results options merged over the defaults."""
+    return {**DEFAULT_CLOSED_RESULTS_OPTIONS, **getattr(settings, 'POLLS_CLOSED_RESULTS', {})}
+
+
+def final_since(end_date):
+    """Return when the results of a poll ending at end_date can no longer change.
+
+    The poll must have closed GRACE seconds ago, so the votes still in the
+    vote queue at the end date are written first.
+    """
+    return end_date + datetime.timedelta(seconds=closed_results_options()['GRACE'])
+
+
+def is_final(question, now=None):
+    """Return True if the results of the question can no longer change."""
+    return final_since(question.end_date) <= (now or timezone.now())
+
+
+def has_final_results(question):
+    """Return True if the results snapshot of the question is taken at its current end date."""
+    snapshot = question.final_results
+    return snapshot is not None and snapshot.get('end_date') == question.end_date.isoformat()
+
+
+def _snapshot_row(question):
+    """Return the query of the row of question, as long as its end date did not change."""
+    return Question.objects.using(DEFAULT_DB_ALIAS).filter(pk=question.pk, end_date=question.end_date)
+
+
+def final_results(question):
+    """Return the results of a closed poll from its snapshot.
+
+    The first read after the poll closed count the votes once on the
+    primary and write the snapshot, every later read use it without a query.
+    """
+    record_cache(has_final_results(question))
+    if not has_final_results(question):
+        results = [_result(row) for row in _results_queryset(question).using(DEFAULT_DB_ALIAS)]
+        question.final_results = {'end_date': question.end_date.isoformat(), 'results': results}
+        _snapshot_row(question).update(final_results=question.final_results)
+    return question.final_results['results']
+
+
+async def afinal_results(question):
+    """Async version of final_results."""
+    record_cache(has_final_results(question))
+    if not has_final_results(question):
+        results = [_result(row) async for row in _results_queryset(question).using(DEFAULT_DB_ALIAS)]
+        question.final_results = {'end_date': question.end_date.isoformat(), 'results': results}
+        await _snapshot_row(question).aupdate(final_results=question.final_results)
+    return question.final_results['results']
+
+
+def patch_final_headers(response, question):
+    """Let browsers and shared caches keep the response about a closed poll for MAX_AGE seconds."""
+    patch_cache_control(response, public=True, max_age=closed_results_options()['MAX_AGE'])
+    response['Last-Modified'] = http_date(question.end_date.timestamp())
+    return response
+
+
+def get_results(question):
+    """Return the results of the question from the cache or from one query.
+
+    The results of a closed poll come from its snapshot.
+
+    Returns:
+        List of dict with id, choice_text and votes of each choice.
+    """
+    if is_final(question):
+        return final_results(question)
+    if results_mode() == 'ttl':
+        return _ttl_results(question)
+    key = RESULTS_KEY.format(question.pk, results_version(question.pk))
+    results = cache.get(key)
+    record_cache(results is not None)
+    if results is None:
+        results = [_result(row) for row in _results_queryset(question)]
+        cache.set(key, results, results_timeout())
+    return results
+
+
+def live_results(question):
+    """Return the results a live client apply the next deltas to, with their version.
+
+    The version is read first: a vote bump the version after its commit, so
+    every vote up to that version is in the results and its delta can be
+    dropped. In 'ttl' mode the cached results can be up to the timeout old,
+    so they are read from the primary instead.
+
+    Returns:
+        Tuple of the results version and the results.
+    """
+    version = results_version(question.pk)
+    if results_mode() == 'ttl' and not is_final(question):
+        return version, [_result(row) for row in _results_queryset(question).using(DEFAULT_DB_ALIAS)]
+    return version, get_results(question)
+
+
+async def aget_results(question):
+    """Async version of get_results."""
+    if is_final(question):
+        return await afinal_results(question)
+    if results_mode() == 'ttl':
+        return await _attl_results(question)
+    key = RESULTS_KEY.format(question.pk, await aresults_version(question.pk))
+    results = await cache.aget(key)
+    record_cache(results is not None)
+    if results is None:
+        results = [_result(row) async for row in _results_queryset(question)]
+        await cache.aset(key, results, results_timeout())
+    return results
+
+
+def question_version(question_id):
+    """Return the version of the question and its choices, bumped when one of them is saved or deleted."""
+    key = QUESTION_KEY.format(question_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def question_window(question_id):
+    """Return the (pub_date, end_date) of the question, None if there is no such question.
+
+    Cached under the question version, so it is read again once the
+    question is saved.
+    """
+    key = WINDOW_KEY.format(question_id, question_version(question_id))
+    window = cache.get(key)
+    if window is None:
+        window = (Question.objects.using(DEFAULT_DB_ALIAS).filter(pk=question_id)
+                  .values_list('pub_date', 'end_date').first()) or ()
+        cache.set(key, window, None)
+    return window or None
+
+
+def bump_question_version(question_id):
+    """Mark the question or its choices as changed."""
+    try:
+        cache.incr(QUESTION_KEY.format(question_id))
+    except ValueError:
+        cache.set(QUESTION_KEY.format(question_id), time.time_ns(), None)
+
+
+def timeline_version(question_id):
+    """Return the version of the vote timeline of the question, bumped when its buckets change."""
+    key = TIMELINE_KEY.format(question_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_timeline_version(question_id):
+    """Mark the vote timeline of the question as changed."""
+    try:
+        cache.incr(TIMELINE_KEY.format(question_id))
+    except ValueError:
+        cache.set(TIMELINE_KEY.format(question_id), time.time_ns(), None)
+
+
+def catalog_version():
+    """Return the version of the question list, bumped when a question is saved or deleted."""
+    version = cache.get(CATALOG_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(CATALOG_KEY, version, None):
+            version = cache.get(CATALOG_KEY, version)
+    return version
+
+
+async def acatalog_version():
+    """Async version of catalog_version."""
+    version = await cache.aget(CATALOG_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(CATALOG_KEY, version, None):
+            version = await cache.aget(CATALOG_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate everything cached from the question list."""
+    try:
+        cache.incr(CATALOG_KEY)
+    except ValueError:
+        cache.set(CATALOG_KEY, time.time_ns(), None)
+    cache.delete(TRANSITION_KEY)
+
+
+def next_transition():
+    """Return the next time a question open or close, None if no question will.
+
+    The time is cached until it pass or a question change.
+    """
+    now = timezone.now()
+    transition = cache.get(TRANSITION_KEY, 'missing')
+    if transition == 'missing' or (transition is not None and transition <= now):
+        transition = Question.objects.next_transition(now)
+        cache.set(TRANSITION_KEY, transition, None)
+    return transition
+
+
+async def anext_transition():
+    """Async version of next_transition."""
+    now = timezone.now()
+    transition = await cache.aget(TRANSITION_KEY, 'missing')
+    if transition == 'missing' or (transition is not None and transition <= now):
+        transition = await Question.objects.anext_transition(now)
+        await cache.aset(TRANSITION_KEY, transition, None)
+    return transition
+
+
+def _state(version, transition):
+    """Return the catalog state of the version and the next transition."""
+    return '{}-{}'.format(version, int(transition.timestamp()) if transition else 'none')
+
+
+def catalog_state():
+    """Return the cache key part for pages that show which questions are open.
+
+    It change when a question is saved or deleted and when the next question
+    open or close, so a page cached under it never show a closed poll as
+    votable, not even one second after the end date.
+    """
+    return _state(catalog_version(), next_transition())
+
+
+async def acatalog_state():
+    """Async version of catalog_state."""
+    return _state(await acatalog_version(), await anext_transition())
+
+
+def transition_timeout(timeout):
+    """Cap timeout at the next time a question open or close.
+
+    Returns:
+        Seconds to keep a page that show which questions are open.
+    """
+    return _timeout(next_transition(), timeout)
+
+
+async def atransition_timeout(timeout):
+    """Async version of transition_timeout."""
+    return _timeout(await anext_transition(), timeout)
+
+
+def _timeout(transition, timeout):
+    """Cap timeout at the transition."""
+    if transition is None:
+        return timeout
+    return max(1, min(timeout, math.ceil((transition - timezone.now()).total_seconds())))
+
+
+def single_flight(key, build, timeout, lock_timeout=10, wait=0.05, attempts=40):
+    """Return the value of key, building it once when many requests miss together.
+
+    The first request that miss take a lock key and build the value, the
+    others wait for the value instead of running the same queries. After
+    attempts waits without a value they build it themselves.
+
+    Args:
+        key: cache key of the value.
+        build: function returning the value.
+        timeout: seconds to keep the value.
+        lock_timeout: seconds after which a lock of a crashed builder is released.
+    """
+    value = cache.get(key)
+    record_cache(value is not None)
+    if value is not None:
+        return value
+    lock = key + ':lock'
+    if not cache.add(lock, True, lock_timeout):
+        for _ in range(attempts):
+            time.sleep(wait)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return build()
+    try:
+        value = build()
+        cache.set(key, value, timeout)
+    finally:
+        cache.delete(lock)
+    return value
+
+
+async def asingle_flight(key, build, timeout, lock_timeout=10, wait=0.05, attempts=40):
+    """Async version of single_flight, build is a coroutine function."""
+    value = await cache.aget(key)
+    record_cache(value is not None)
+    if value is not None:
+        return value
+    lock = key + ':lock'
+    if not await cache.aadd(lock, True, lock_timeout):
+        for _ in range(attempts):
+            await asyncio.sleep(wait)
+            value = await cache.aget(key)
+            if value is not None:
+                return value
+        return await build()
+    try:
+        value = await build()
+        await cache.aset(key, value, timeout)
+    finally:
+        await cache.adelete(lock)
+    return value
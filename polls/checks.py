@@ -0,0 +1,22 @@
+"""Module for the system checks of the polls settings."""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when the default cache is local to each process outside DEBUG.
+
+    The results versions, the throttle buckets and the vote dedupe keys are
+    shared through the default cache, every process must see the same one.
+    """
+    if settings.DEBUG or settings.CACHES.get('default', {}).get('BACKEND') != LOCMEM_CACHE:
+        return []
+    return [Warning(
+        'The default cache is LocMemCache, every process keep its own copy of the results versions, '
+        'the throttle buckets and the vote dedupe keys.',
+        hint='Set CACHE_URL to a shared cache such as Redis or Memcached.',
+        id='polls.W001',
+    )]
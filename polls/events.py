@@ -0,0 +1,225 @@
+"""Module for the vote event log and the tallies materialized from it.
+
+Every write of a Vote append a VoteEvent in the same transaction, so the
+log keep the switches that Vote overwrite. The materializer apply the
+events after its checkpoint to EventTally in batches, without reading
+the Vote table, and the events of a question alone give its results at
+any past time. A second consumer roll the events up in per minute and
+per hour VoteBucket rows for the vote timeline.
+"""
+import datetime
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .caching import bump_timeline_version, closed_results_options
+from .models import EventCheckpoint, EventTally, VoteBucket, VoteEvent
+
+MATERIALIZER = 'tallies'
+TIMELINE = 'timeline'
+MINUTE = 60
+HOUR = 3600
+
+DEFAULT_EVENT_OPTIONS = {
+    'BATCH_SIZE': 1000,
+    'GAP_TIMEOUT': 300,
+}
+
+
+def event_options():
+    """Return the event log options merged over the defaults."""
+    return {**DEFAULT_EVENT_OPTIONS, **getattr(settings, 'POLLS_EVENTS', {})}
+
+
+def lock_checkpoint(name):
+    """Return the checkpoint of name, locked until the end of the transaction."""
+    EventCheckpoint.objects.get_or_create(name=name)
+    return EventCheckpoint.objects.select_for_update().get(name=name)
+
+
+def next_events(checkpoint, fields, batch_size):
+    """Return the values_list rows of fields of the events not applied by checkpoint, in id order.
+
+    These are the events after its position and the events that committed
+    since in one of its gaps. The gaps older than GAP_TIMEOUT seconds are
+    dropped first. fields must start with 'pk'.
+    """
+    expired = time.time() - event_options()['GAP_TIMEOUT']
+    checkpoint.gaps = [gap for gap in checkpoint.gaps if gap[2] > expired]
+    unseen = Q(pk__gt=checkpoint.position)
+    for low, high, _ in checkpoint.gaps:
+        unseen |= Q(pk__range=(low, high))
+    events = VoteEvent.objects.filter(unseen).order_by('pk').values_list(*fields)
+    return list(events[:batch_size])
+
+
+def advance_checkpoint(checkpoint, events):
+    """Move checkpoint past the events of next_events and save it.
+
+    An id is taken when the event is inserted, not when it commits, so an id
+    below the last event read can still come from a transaction in progress.
+    The ids skipped are kept as gaps and looked up again by the next batches,
+    until GAP_TIMEOUT seconds passed: by then the transaction was rolled back
+    or the event deleted.
+    """
+    ids = [event[0] for event in events]
+    gaps = checkpoint.gaps
+    if ids[-1] > checkpoint.position:
+        gaps = gaps + [[checkpoint.position + 1, ids[-1], time.time()]]
+        checkpoint.position = ids[-1]
+    checkpoint.gaps = [part for low, high, seen in gaps for part in _split_gap(low, high, seen, ids)]
+    checkpoint.save(update_fields=['position', 'gaps', 'updated_at'])
+
+
+def _split_gap(low, high, seen, ids):
+    """Yield the parts of the gap from low to high that are not in the sorted ids."""
+    for pk in ids:
+        if low <= pk <= high:
+            if pk > low:
+                yield [low, pk - 1, seen]
+            low = pk + 1
+    if low <= high:
+        yield [low, high, seen]
+
+
+def materialize_events(batch_size=None):
+    """Apply the new events to EventTally, one batch per transaction.
+
+    Each batch is folded to one UPDATE per touched choice, and the
+    checkpoint move past its events in the same transaction, so a crash
+    never apply an event twice.
+
+    Args:
+        batch_size: events per transaction, BATCH_SIZE if not given.
+
+    Returns:
+        Number of events applied.
+    """
+    batch_size = batch_size or event_options()['BATCH_SIZE']
+    applied = 0
+    while True:
+        with transaction.atomic():
+            checkpoint = lock_checkpoint(MATERIALIZER)
+            events = next_events(checkpoint, ('pk', 'choice_id', 'previous_choice_id'), batch_size)
+            if not events:
+                return applied
+            deltas = Counter()
+            for _, choice_id, previous_choice_id in events:
+                deltas[choice_id] += 1
+                if previous_choice_id is not None:
+                    deltas[previous_choice_id] -= 1
+            for choice_id, delta in deltas.items():
+                if delta and not EventTally.objects.filter(choice_id=choice_id).update(votes=F('votes') + delta):
+                    EventTally.objects.create(choice_id=choice_id, votes=delta)
+            advance_checkpoint(checkpoint, events)
+        applied += len(events)
+        if len(events) < batch_size:
+            return applied
+
+
+def reset_materialized():
+    """Drop the materialized tallies and rewind the checkpoint, the next run rebuild them."""
+    with transaction.atomic():
+        lock_checkpoint(MATERIALIZER)
+        EventTally.objects.all().delete()
+        EventCheckpoint.objects.filter(name=MATERIALIZER).update(position=0, gaps=[])
+
+
+def results_at(question, when):
+    """Return the results of question as they were at when, from its events.
+
+    Returns:
+        List of dict with id, choice_text and votes of each choice, like get_results.
+    """
+    events = VoteEvent.objects.filter(question=question, created_at__lte=when).order_by()
+    added = dict(events.values_list('choice').annotate(n=Count('pk')))
+    left = dict(events.exclude(previous_choice=None).values_list('previous_choice').annotate(n=Count('pk')))
+    return [{'id': pk, 'choice_text': choice_text, 'votes': added.get(pk, 0) - left.get(pk, 0)}
+            for pk, choice_text in question.choice_set.order_by('pk').values_list('id', 'choice_text')]
+
+
+def bucket_start(when, size):
+    """Return the start of the bucket of size seconds that contain when."""
+    return datetime.datetime.fromtimestamp(int(when.timestamp()) // size * size, tz=datetime.timezone.utc)
+
+
+def roll_up_events(batch_size=None):
+    """Add the new events to the minute and hour buckets of their choices.
+
+    Runs like materialize_events with its own checkpoint, so a vote never
+    wait for the row of the current minute: a batch add one UPDATE per
+    touched bucket. A switch count -1 for the choice it left in the bucket
+    of the switch. The timeline version of the touched questions is bumped
+    after the commit.
+
+    Returns:
+        Number of events rolled up.
+    """
+    batch_size = batch_size or event_options()['BATCH_SIZE']
+    fields = ('pk', 'question_id', 'choice_id', 'previous_choice_id', 'created_at')
+    rolled = 0
+    while True:
+        with transaction.atomic():
+            checkpoint = lock_checkpoint(TIMELINE)
+            events = next_events(checkpoint, fields, batch_size)
+            if not events:
+                return rolled
+            deltas = Counter()
+            for _, question_id, choice_id, previous_choice_id, created_at in events:
+                for size in (MINUTE, HOUR):
+                    start = bucket_start(created_at, size)
+                    deltas[question_id, choice_id, size, start] += 1
+                    if previous_choice_id is not None:
+                        deltas[question_id, previous_choice_id, size, start] -= 1
+            for (question_id, choice_id, size, start), delta in deltas.items():
+                bucket = VoteBucket.objects.filter(choice_id=choice_id, size=size, start=start)
+                if delta and not bucket.update(votes=F('votes') + delta):
+                    VoteBucket.objects.create(question_id=question_id, choice_id=choice_id, size=size, start=start,
+                                              votes=delta)
+            advance_checkpoint(checkpoint, events)
+            for question_id in {event[1] for event in events}:
+                transaction.on_commit(lambda pk=question_id: bump_timeline_version(pk))
+        rolled += len(events)
+        if len(events) < batch_size:
+            return rolled
+
+
+def downsample_timeline():
+    """Delete the minute buckets of the closed polls, their hour buckets stay.
+
+    Returns:
+        Number of minute buckets deleted.
+    """
+    grace = datetime.timedelta(seconds=closed_results_options()['GRACE'])
+    closed = VoteBucket.objects.filter(size=MINUTE, question__end_date__lte=timezone.now() - grace)
+    question_ids = set(closed.values_list('question_id', flat=True).distinct())
+    deleted = closed.delete()[0]
+    for question_id in question_ids:
+        bump_timeline_version(question_id)
+    return deleted
+
+
+def vote_timeline(question_id, size=HOUR):
+    """Return the votes over time of the question from its buckets only.
+
+    The cost follow the number of buckets, not the number of votes.
+
+    Args:
+        question_id: id of the question.
+        size: MINUTE or HOUR, the minute buckets are gone once the poll closed.
+
+    Returns:
+        List of dict with the start of each bucket and the net votes of each choice id in it.
+    """
+    buckets = (VoteBucket.objects.filter(question_id=question_id, size=size).order_by('start', 'choice_id')
+               .values_list('start', 'choice_id', 'votes'))
+    timeline = []
+    for start, choice_id, votes in buckets:
+        if not timeline or timeline[-1]['start'] != start:
+            timeline.append({'start': start, 'votes': {}})
+        timeline[-1]['votes'][choice_id] = votes
+    return timeline
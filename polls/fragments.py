@@ -0,0 +1,161 @@
+"""Module for caching the rendered question list and the anonymous index page.
+
+The question list is the same for every user, so it is cached as HTML
+under the catalog state: a new key is used as soon as a question is saved,
+opens or closes. The greeting and the messages stay outside of it and are
+rendered on every request. Anonymous users all see the same index, so
+their page is cached whole.
+"""
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.safestring import mark_safe
+
+from .caching import (acatalog_state, asingle_flight, atransition_timeout, catalog_state, single_flight,
+                      transition_timeout)
+from .metrics import record_cache
+from .models import Question
+from .pagination import akeyset_page, keyset_page
+
+LIST_KEY = 'polls:index:list:{}:{}'
+PAGE_KEY = 'polls:index:page:{}:{}'
+
+
+def index_cache_timeout():
+    """Return how many seconds the index stay in the cache, 0 to not cache it."""
+    return getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 300)
+
+
+def _digest(value):
+    """Return a short hash of value for a cache key."""
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def _list_query(open_only):
+    """Return the questions of the index, only the open ones if open_only.
+
+    A cached list is stored under the catalog version, so it is read from
+    the primary like the versioned results. Without the cache it is read
+    from a replica like the other poll pages.
+    """
+    questions = Question.objects.defer('final_results')
+    if index_cache_timeout():
+        questions = questions.using(DEFAULT_DB_ALIAS)
+    return questions.open() if open_only else questions.published()
+
+
+def _render_list(page, next_cursor, open_only):
+    """Render the question list template."""
+    return render_to_string('polls/question_list.html', {
+        'latest_question_list': page,
+        'next_cursor': next_cursor,
+        'open_only': open_only,
+    })
+
+
+def question_list(open_only=False, cursor=None):
+    """Return the HTML of one page of the question list.
+
+    Args:
+        open_only: keep only the questions that can be voted now.
+        cursor: cursor of the page, None for the first page.
+    """
+    page_size = getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20)
+
+    def build():
+        return _render_list(*keyset_page(_list_query(open_only), cursor, page_size), open_only)
+
+    timeout = index_cache_timeout()
+    if not timeout:
+        return mark_safe(build())
+    key = LIST_KEY.format(catalog_state(), _digest('{}:{}:{}'.format(open_only, cursor, page_size)))
+    return mark_safe(single_flight(key, build, timeout))
+
+
+async def aquestion_list(open_only=False, cursor=None):
+    """Async version of question_list."""
+    page_size = getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20)
+
+    async def build():
+        return _render_list(*await akeyset_page(_list_query(open_only), cursor, page_size), open_only)
+
+    timeout = index_cache_timeout()
+    if not timeout:
+        return mark_safe(await build())
+    key = LIST_KEY.format(await acatalog_state(), _digest('{}:{}:{}'.format(open_only, cursor, page_size)))
+    return mark_safe(await asingle_flight(key, build, timeout))
+
+
+def _page_key(request, state):
+    """Return the cache key of the anonymous page of the request."""
+    return PAGE_KEY.format(state, _digest(request.get_full_path()))
+
+
+def _finish(response, anonymous, max_age):
+    """Add the Vary and Cache-Control headers of the index page."""
+    patch_vary_headers(response, ('Cookie',))
+    if anonymous:
+        patch_cache_control(response, public=True, max_age=max_age)
+    else:
+        patch_cache_control(response, private=True)
+    return response
+
+
+def cache_anonymous_page(view):
+    """Cache the whole page of GET requests by anonymous users without messages.
+
+    The page is kept under the catalog state and the full path, and sent
+    with Vary: Cookie, so shared caches never give it to a logged in user.
+    Works on sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            timeout = index_cache_timeout()
+            anonymous = (request.method == 'GET' and bool(timeout)
+                         and not (await request.auser()).is_authenticated
+                         and not await sync_to_async(len)(messages.get_messages(request)))
+            if not anonymous:
+                return _finish(await view(request, *args, **kwargs), False, 0)
+            key = _page_key(request, await acatalog_state())
+            cached = await cache.aget(key)
+            record_cache(cached is not None)
+            if cached is None:
+                response = await view(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+                if response.status_code == 200:
+                    await cache.aset(key, (response.content, response['Content-Type']), timeout)
+            else:
+                response = HttpResponse(cached[0], content_type=cached[1])
+            return _finish(response, True, await atransition_timeout(timeout))
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = index_cache_timeout()
+        anonymous = (request.method == 'GET' and bool(timeout) and not request.user.is_authenticated
+                     and not len(messages.get_messages(request)))
+        if not anonymous:
+            return _finish(view(request, *args, **kwargs), False, 0)
+        key = _page_key(request, catalog_state())
+        cached = cache.get(key)
+        record_cache(cached is not None)
+        if cached is None:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            if response.status_code == 200:
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+        else:
+            response = HttpResponse(cached[0], content_type=cached[1])
+        return _finish(response, True, transition_timeout(timeout))
+    return wrapper
@@ -0,0 +1,94 @@
+"""Module for running the password hashing of logins in a bounded thread pool.
+
+A login spend most of its time in PBKDF2. When many users log in at a poll
+opening, the hashing of every login run at once and take the CPU from the
+vote requests. With POLLS_HASHING['POOL_SIZE'] set, the hashes run in a pool
+of that many threads (hashlib release the GIL, so they use at most that many
+cores), at most QUEUE logins wait for a thread and the others are refused
+with HashingBusy instead of piling up.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher
+
+DEFAULT_HASHING_OPTIONS = {
+    'POOL_SIZE': 0,
+    'QUEUE': 16,
+    'TIMEOUT': 5.0,
+}
+
+
+class HashingBusy(Exception):
+    """Raised when every hashing thread is busy and the queue is full."""
+
+
+def hashing_options():
+    """Return the hashing pool options merged over the defaults."""
+    return {**DEFAULT_HASHING_OPTIONS, **getattr(settings, 'POLLS_HASHING', {})}
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Return the pool and the semaphore of its slots, built once per process."""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            options = hashing_options()
+            _pool = ThreadPoolExecutor(options['POOL_SIZE'], thread_name_prefix='polls-hashing')
+            _slots = threading.BoundedSemaphore(options['POOL_SIZE'] + options['QUEUE'])
+    return _pool, _slots
+
+
+def run_hashing(func, *args):
+    """Call func in the hashing pool and return its result, directly if there is no pool.
+
+    Raises:
+        HashingBusy: no slot freed within TIMEOUT seconds.
+    """
+    options = hashing_options()
+    if not options['POOL_SIZE']:
+        return func(*args)
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=options['TIMEOUT']):
+        raise HashingBusy
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend that hash in the pool.
+
+    Only the hashing run in the pool, the queries and the save of an
+    upgraded hash stay in the request thread and its connection.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """Return the user if the password match, like ModelBackend."""
+        user_model = get_user_model()
+        if username is None:
+            username = kwargs.get(user_model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = user_model._default_manager.get_by_natural_key(username)
+        except user_model.DoesNotExist:
+            # Hash anyway, so a missing user take as long as a wrong password.
+            run_hashing(user_model().set_password, password)
+            return None
+        if not run_hashing(check_password, password, user.password) or not self.user_can_authenticate(user):
+            return None
+        preferred = get_hasher()
+        if identify_hasher(user.password).algorithm != preferred.algorithm or preferred.must_update(user.password):
+            run_hashing(user.set_password, password)
+            user.save(update_fields=['password'])
+        return user
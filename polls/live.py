@@ -0,0 +1,204 @@
+"""Module for push the live results to Server-Sent Events clients.
+
+The vote write path publish the change of each choice tally to the broker,
+which add it at once to the subscriptions of the question. Every tick the
+broker only wake the subscriptions that changed, so the fan-out cost depend
+on the number of ticks and clients, not on the number of votes, and a
+client never get a vote published before it subscribed.
+
+Each change carry the results version it was bumped to. A client drop the
+changes up to the version of its snapshot, they are already counted in it.
+
+The votes are written from any thread and the clients can wait in
+different event loops (one per request under WSGI), so the tick run in
+one thread of the broker and wake each client in its own loop.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_LIVE_OPTIONS = {
+    'ENABLED': False,
+    'BROKER': 'polls.live.InMemoryBroker',
+    'TICK': 1.0,
+    'KEEPALIVE': 15.0,
+}
+
+
+def live_options():
+    """Return the live results options merged over the defaults."""
+    return {**DEFAULT_LIVE_OPTIONS, **getattr(settings, 'POLLS_LIVE', {})}
+
+
+class BaseBroker:
+    """Interface of the live results brokers."""
+
+    def publish(self, question_id, deltas, version=None):
+        """Add the tally changes of the question, called from any thread.
+
+        Args:
+            question_id: id of the question.
+            deltas: dict of choice id to the change of its votes.
+            version: results version the changes were bumped to, None if unknown.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, question_id):
+        """Return a Subscription to the merged deltas of the question, called in the event loop."""
+        raise NotImplementedError
+
+
+class Subscription:
+    """Merged tally changes waiting for one client."""
+
+    def __init__(self, broker, question_id):
+        """Set up an empty subscription in the running event loop."""
+        self.broker = broker
+        self.question_id = question_id
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.early = []
+        self.since = None
+        self.version = None
+        self.pending_version = None
+        self.loop = asyncio.get_running_loop()
+        self.ready = asyncio.Event()
+
+    def add(self, deltas, version=None):
+        """Merge the changes of one vote, called from any thread.
+
+        Changes up to the snapshot version are dropped. Before the snapshot
+        version is known the versioned changes are kept aside.
+        """
+        with self.lock:
+            if version is not None and self.since is None:
+                self.early.append((version, deltas))
+            elif version is None or version > self.since:
+                self._merge(deltas, version)
+
+    def _merge(self, deltas, version):
+        """Merge the changes into the pending ones, with the lock held."""
+        self.pending.update(deltas)
+        if version is not None:
+            self.pending_version = max(version, self.pending_version or version)
+
+    def set_since(self, version):
+        """Set the version of the snapshot the client start from, called in the event loop."""
+        with self.lock:
+            self.since = version
+            early, self.early = self.early, []
+            for early_version, deltas in early:
+                if early_version > version:
+                    self._merge(deltas, early_version)
+            if self.pending:
+                self.ready.set()
+
+    def wake(self):
+        """Wake the client, called from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # The loop is closed, the client is gone.
+            pass
+
+    async def get(self, timeout=None):
+        """Wait for the next deltas.
+
+        The version of the newest change returned is kept in ``version``,
+        None if the changes were published without one.
+
+        Returns:
+            Dict of choice id to the change of its votes, None after timeout seconds.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        with self.lock:
+            deltas = {choice_id: delta for choice_id, delta in self.pending.items() if delta}
+            self.pending.clear()
+            self.version, self.pending_version = self.pending_version, None
+        return deltas
+
+    def close(self):
+        """Stop receiving deltas."""
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker(BaseBroker):
+    """Broker that fan out inside one process."""
+
+    def __init__(self, tick=None):
+        """Set up the broker with the tick length in seconds, POLLS_LIVE['TICK'] if not given."""
+        self.tick = tick
+        self.lock = threading.Lock()
+        self.changed = set()
+        self.subscribers = {}
+        self.ticker = None
+
+    def publish(self, question_id, deltas, version=None):
+        """Add the tally changes to the current subscriptions of the question, woken at the next tick."""
+        if question_id not in self.subscribers:
+            return
+        with self.lock:
+            subscriptions = self.subscribers.get(question_id, ())
+            for subscription in subscriptions:
+                subscription.add(deltas, version)
+            self.changed.update(subscriptions)
+
+    def subscribe(self, question_id):
+        """Add a subscription and start the ticker thread if it is not running."""
+        subscription = Subscription(self, question_id)
+        with self.lock:
+            self.subscribers.setdefault(question_id, set()).add(subscription)
+            if self.ticker is None:
+                self.ticker = threading.Thread(target=self.run, name='polls-live-ticker', daemon=True)
+                self.ticker.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove the subscription."""
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.question_id, set())
+            subscriptions.discard(subscription)
+            self.changed.discard(subscription)
+            if not subscriptions:
+                self.subscribers.pop(subscription.question_id, None)
+
+    def flush(self):
+        """Wake the subscriptions that got changes since the last tick."""
+        with self.lock:
+            changed, self.changed = self.changed, set()
+        for subscription in changed:
+            subscription.wake()
+
+    def run(self):
+        """Flush every tick while anybody is subscribed, in the ticker thread."""
+        while True:
+            time.sleep(self.tick or live_options()['TICK'])
+            self.flush()
+            with self.lock:
+                if not self.subscribers:
+                    self.ticker = None
+                    return
+
+
+_broker = None
+
+
+def get_broker():
+    """Return the broker of this process, built from POLLS_LIVE['BROKER']."""
+    global _broker
+    if _broker is None:
+        _broker = import_string(live_options()['BROKER'])()
+    return _broker
+
+
+def publish(question_id, deltas, version=None):
+    """Publish the tally changes of the question and their results version to the broker."""
+    get_broker().publish(question_id, deltas, version)
@@ -0,0 +1,29 @@
+"""Command for fold the vote counter shards back into the choices."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from polls.voting import compact_counters
+
+
+class Command(BaseCommand):
+    """Compact the counter shards once or keep compacting them as a daemon."""
+
+    help = 'Fold the vote counter shards into Choice.votes.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('--once', action='store_true', help='Compact once and exit.')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds to wait between two compactions.')
+
+    def handle(self, *args, **options):
+        """Compact, and repeat every interval unless --once."""
+        while True:
+            folded = compact_counters()
+            if folded:
+                self.stdout.write('Folded {} counter shards.'.format(folded))
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,53 @@
+"""Command for export the Vote rows to a CSV or JSONL file."""
+import csv
+import itertools
+import json
+
+from django.core.management.base import BaseCommand
+
+from polls.models import ArchivedVote, Vote
+
+FIELDS = ('id', 'question_id', 'choice_id', 'user_id', 'user__username')
+
+
+class Command(BaseCommand):
+    """Stream the votes in chunks, so memory stay the same whatever the table size."""
+
+    help = 'Export the votes as CSV or JSONL to a file or stdout.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('--output', help='File to write, stdout if not given.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--question', type=int, help='Only export the votes of this question.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        """Write one line per vote, the archived votes after the others."""
+        querysets = [Vote.objects.order_by('pk'), ArchivedVote.objects.order_by('pk')]
+        if options['question'] is not None:
+            querysets = [votes.filter(question_id=options['question']) for votes in querysets]
+        rows = itertools.chain.from_iterable(votes.values_list(*FIELDS).iterator(chunk_size=options['chunk_size'])
+                                             for votes in querysets)
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else None
+        stream = output or self.stdout
+        try:
+            count = 0
+            if options['format'] == 'csv':
+                writer = csv.writer(stream)
+                writer.writerow(['id', 'question_id', 'choice_id', 'user_id', 'username'])
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            else:
+                keys = ('id', 'question_id', 'choice_id', 'user_id', 'username')
+                for row in rows:
+                    stream.write(json.dumps(dict(zip(keys, row))) + '\n')
+                    count += 1
+        finally:
+            if output:
+                output.close()
+        if output:
+            self.stderr.write('Exported {} votes to {}.'.format(count, options['output']))
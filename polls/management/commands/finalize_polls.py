@@ -0,0 +1,22 @@
+"""Command for take the results snapshots of the closed polls and archive their votes."""
+from django.core.management.base import BaseCommand
+
+from polls.voting import archive_votes, finalize_closed_polls
+
+
+class Command(BaseCommand):
+    """Write the snapshot of every closed poll without one, and optionally archive old votes."""
+
+    help = 'Take the results snapshots of the closed polls, with --archive move their old votes to ArchivedVote.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('--archive', action='store_true',
+                            help='Move the votes of polls closed POLLS_CLOSED_RESULTS["ARCHIVE_AFTER"] days ago.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Votes moved per transaction.')
+
+    def handle(self, *args, **options):
+        """Take the snapshots, then archive if asked."""
+        self.stdout.write('Took {} results snapshots.'.format(finalize_closed_polls()))
+        if options['archive']:
+            self.stdout.write('Archived {} votes.'.format(archive_votes(batch_size=options['batch_size'])))
@@ -0,0 +1,98 @@
+"""Command for import questions and choices from a CSV or JSONL file."""
+import csv
+import itertools
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from polls.caching import bump_catalog_version
+from polls.models import Question, Choice
+
+
+def parse_date(value):
+    """Return the aware datetime of an ISO 8601 string."""
+    date = parse_datetime(value or '')
+    if date is None:
+        raise CommandError('Invalid date {!r}.'.format(value))
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def read_jsonl(lines):
+    """Yield (question_text, pub_date, end_date, choices) from JSONL lines.
+
+    Each line is {"question_text": ..., "pub_date": ..., "end_date": ..., "choices": [...]}.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            yield (row['question_text'], parse_date(row['pub_date']), parse_date(row['end_date']),
+                   list(row.get('choices', [])))
+        except (ValueError, KeyError, TypeError) as error:
+            raise CommandError('Line {}: {}'.format(number, error))
+
+
+def read_csv(lines):
+    """Yield (question_text, pub_date, end_date, choices) from CSV lines.
+
+    The header is question_text,pub_date,end_date,choice_text with one row per
+    choice, the rows of one question follow each other.
+    """
+    rows = csv.DictReader(lines)
+    missing = {'question_text', 'pub_date', 'end_date', 'choice_text'} - set(rows.fieldnames or [])
+    if missing:
+        raise CommandError('Missing CSV columns: {}.'.format(', '.join(sorted(missing))))
+    key = lambda row: (row['question_text'], row['pub_date'], row['end_date'])  # noqa: E731
+    for (text, pub_date, end_date), group in itertools.groupby(rows, key):
+        choices = [row['choice_text'] for row in group if row['choice_text']]
+        yield text, parse_date(pub_date), parse_date(end_date), choices
+
+
+class Command(BaseCommand):
+    """Import polls with bulk_create in chunked transactions."""
+
+    help = 'Import questions and choices from a CSV or JSONL file, "-" read stdin.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('path', help='File to import, "-" for stdin.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='File format, guessed from the extension if not given.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Questions written in one transaction.')
+
+    def handle(self, *args, **options):
+        """Read the file in batches and create the questions and their choices."""
+        file_format = options['format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        source = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        try:
+            polls = read_csv(source) if file_format == 'csv' else read_jsonl(source)
+            questions = choices = 0
+            while True:
+                batch = list(itertools.islice(polls, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    created = Question.objects.bulk_create([
+                        Question(question_text=text, pub_date=pub_date, end_date=end_date)
+                        for text, pub_date, end_date, _ in batch
+                    ])
+                    new_choices = Choice.objects.bulk_create([
+                        Choice(question=question, choice_text=choice_text)
+                        for question, (_, _, _, texts) in zip(created, batch) for choice_text in texts
+                    ])
+                questions += len(created)
+                choices += len(new_choices)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        # bulk_create does not send post_save, invalidate the question list here.
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS('Imported {} questions and {} choices.'.format(questions, choices)))
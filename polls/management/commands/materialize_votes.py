@@ -0,0 +1,58 @@
+"""Command for apply the vote events to the materialized tallies and the vote timeline."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+
+from polls.events import downsample_timeline, materialize_events, reset_materialized, results_at, roll_up_events
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Materialize the new vote events once or keep materializing them as a daemon."""
+
+    help = 'Apply the new vote events to the tallies and the timeline, or print the results at a past time.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('--once', action='store_true', help='Materialize once and exit.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait between two runs.')
+        parser.add_argument('--batch-size', type=int, help='Events per transaction.')
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild the tallies from the first event.')
+        parser.add_argument('--question', type=int, help='With --at, print the results of this question.')
+        parser.add_argument('--at', help='Print the results of --question at this ISO time and exit.')
+
+    def handle(self, *args, **options):
+        """Materialize, roll up and downsample, and repeat every interval unless --once."""
+        if options['at'] is not None:
+            self.print_results(options['question'], options['at'])
+            return
+        if options['rebuild']:
+            reset_materialized()
+        while True:
+            applied = materialize_events(options['batch_size'])
+            if applied:
+                self.stdout.write('Applied {} vote events.'.format(applied))
+            rolled = roll_up_events(options['batch_size'])
+            if rolled:
+                self.stdout.write('Rolled up {} vote events.'.format(rolled))
+            dropped = downsample_timeline()
+            if dropped:
+                self.stdout.write('Dropped {} minute buckets of closed polls.'.format(dropped))
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def print_results(self, question_id, at):
+        """Print the votes of each choice of the question at the time."""
+        when = parse_datetime(at)
+        if when is None:
+            raise CommandError('--at must be an ISO date and time.')
+        try:
+            question = Question.objects.get(pk=question_id)
+        except Question.DoesNotExist:
+            raise CommandError('Question {} does not exist.'.format(question_id))
+        for result in results_at(question, when):
+            self.stdout.write('{id} "{choice_text}": {votes}'.format(**result))
@@ -0,0 +1,31 @@
+"""Command for write the queued votes in batches."""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from polls.queue import drain_vote_queue, queue_options
+
+
+class Command(BaseCommand):
+    """Flush the vote queue once or keep flushing it as a daemon."""
+
+    help = 'Write the queued votes in batches.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--batch-size', type=int, help='Queued votes written in one transaction.')
+        parser.add_argument('--interval', type=float, help='Seconds to wait between two flushes.')
+
+    def handle(self, *args, **options):
+        """Drain the queue, and repeat every interval unless --once."""
+        interval = options['interval'] or queue_options()['FLUSH_INTERVAL']
+        while True:
+            flushed = drain_vote_queue(options['batch_size'])
+            if flushed:
+                self.stdout.write('Wrote {} queued votes.'.format(flushed))
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(interval)
@@ -0,0 +1,38 @@
+"""Command for rebuild or check the vote tallies from the Vote rows."""
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.models import Question
+from polls.voting import recount_votes
+
+
+class Command(BaseCommand):
+    """Recount votes of every question or only one question."""
+
+    help = 'Rebuild the vote tallies of Question and Choice from the Vote rows.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('--question', type=int, help='Only recount the question with this id.')
+        parser.add_argument('--check', action='store_true',
+                            help='Only report wrong tallies and exit with error if any was found.')
+
+    def handle(self, *args, **options):
+        """Recount the tallies and report every tally that was wrong."""
+        question = None
+        if options['question'] is not None:
+            try:
+                question = Question.objects.get(pk=options['question'])
+            except Question.DoesNotExist:
+                raise CommandError('Question {} does not exist.'.format(options['question']))
+
+        mismatches = recount_votes(question, fix=not options['check'])
+        for obj, stored, counted in mismatches:
+            self.stdout.write('{} {} "{}": stored {}, counted {}'.format(
+                obj._meta.model_name, obj.pk, obj, stored, counted))
+
+        if options['check']:
+            if mismatches:
+                raise CommandError('{} vote tallies are wrong.'.format(len(mismatches)))
+            self.stdout.write(self.style.SUCCESS('All vote tallies are correct.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Fixed {} vote tallies.'.format(len(mismatches))))
@@ -0,0 +1,70 @@
+"""Command for fill the page caches before users arrive at a poll opening."""
+import datetime
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from polls.caching import get_results, next_transition
+from polls.fragments import question_list
+from polls.models import Question
+
+
+def warm(window):
+    """Render the first page of both question lists and the results of the newly open questions.
+
+    Args:
+        window: seconds, questions opened this long ago are warmed.
+
+    Returns:
+        Number of questions whose results were warmed.
+    """
+    question_list(open_only=False)
+    question_list(open_only=True)
+    now = timezone.now()
+    questions = Question.objects.open(now).filter(pub_date__gte=now - datetime.timedelta(seconds=window))
+    count = 0
+    # get_results read the end date, an open question has no results snapshot.
+    for question in questions.only('pk', 'end_date'):
+        get_results(question)
+        count += 1
+    return count
+
+
+class Command(BaseCommand):
+    """Warm the caches once, or at every poll opening and closing with --watch."""
+
+    help = 'Fill the question list and results caches, so a poll opening does not stampede the database.'
+
+    def add_arguments(self, parser):
+        """Add the command options."""
+        parser.add_argument('--window', type=int, default=3600,
+                            help='Warm the results of the questions opened in the last seconds.')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and warm again right after every opening and closing.')
+        parser.add_argument('--max-sleep', type=float, default=60,
+                            help='Longest wait between two checks, to notice new questions.')
+
+    def handle(self, *args, **options):
+        """Warm now, and again at every transition with --watch."""
+        cache = caches['default']
+        if isinstance(cache, (LocMemCache, DummyCache)):
+            self.stderr.write(self.style.WARNING(
+                'The default cache is {}, local to this process: the web workers will not see the warmed '
+                'pages. Set CACHE_URL to a shared cache.'.format(type(cache).__name__)))
+        while True:
+            count = warm(options['window'])
+            self.stdout.write('Warmed the question lists and the results of {} questions.'.format(count))
+            if not options['watch']:
+                return
+            close_old_connections()
+            transition = next_transition()
+            wait = options['max_sleep']
+            if transition is not None:
+                # Wake just after the transition, when the new catalog state is in use.
+                wait = min(wait, max(0, (transition - timezone.now()).total_seconds()) + 0.01)
+            time.sleep(wait)
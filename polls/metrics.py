@@ -0,0 +1,65 @@
+"""Module for collect the numbers of the current request."""
+import contextvars
+import time
+
+_current = contextvars.ContextVar('polls_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Wall time, database and cache numbers of one request."""
+
+    def __init__(self, capture_sql=False):
+        """Start the clock.
+
+        Args:
+            capture_sql: keep the SQL text of every query if True.
+        """
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.capture_sql = capture_sql
+        self.sql = []
+
+    @property
+    def elapsed(self):
+        """Return the seconds since the request started."""
+        return time.perf_counter() - self.start
+
+    def __call__(self, execute, sql, params, many, context):
+        """Time one query, used as a connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            if self.capture_sql:
+                self.sql.append((round(duration * 1000, 3), sql))
+
+
+def activate(metrics):
+    """Make metrics the numbers of the current request.
+
+    Returns:
+        Token for deactivate.
+    """
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    """Restore the metrics that were current before activate."""
+    _current.reset(token)
+
+
+def record_cache(hit):
+    """Count a cache hit or miss in the current request, if any."""
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
@@ -0,0 +1,180 @@
+"""Module for the middleware of the polls application."""
+import contextlib
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import routers
+from .metrics import RequestMetrics, activate, deactivate
+from .routers import SAFE_METHODS, STICKY_COOKIE, ReadState
+
+logger = logging.getLogger('polls.metrics')
+slow_logger = logging.getLogger('polls.metrics.slow')
+
+DEFAULT_METRICS_OPTIONS = {
+    'SERVER_TIMING': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SAMPLE_RATE': 0.1,
+}
+
+
+def metrics_options():
+    """Return the metrics options merged over the defaults."""
+    return {**DEFAULT_METRICS_OPTIONS, **getattr(settings, 'POLLS_METRICS', {})}
+
+
+class RequestMetricsMiddleware:
+    """Measure every request and report it as a log line and a Server-Timing header.
+
+    Each request record its wall time, its number of queries and their time
+    (through connection.execute_wrapper) and the cache hits and misses of the
+    polls cache. A sample of the requests slower than SLOW_REQUEST_MS also
+    log the SQL text of their queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keep the next handler, async if it is a coroutine."""
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Measure the request."""
+        if self.is_async:
+            return self.__acall__(request)
+        metrics, token = self._start()
+        try:
+            with self._wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            deactivate(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        """Measure the request of an async handler.
+
+        The ORM run in the thread of sync_to_async, so the execute wrappers
+        are installed and removed in that thread.
+        """
+        metrics, token = self._start()
+        stack = await sync_to_async(self._enter_wrappers)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            deactivate(token)
+        return self._finish(request, response, metrics)
+
+    def _start(self):
+        """Create and activate the metrics of a new request."""
+        options = metrics_options()
+        metrics = RequestMetrics(capture_sql=random.random() < options['SLOW_SAMPLE_RATE'])
+        return metrics, activate(metrics)
+
+    @staticmethod
+    def _wrap_connections(metrics):
+        """Return a context manager that time the queries of every database."""
+        stack = contextlib.ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(metrics))
+        return stack
+
+    def _enter_wrappers(self, metrics):
+        """Enter the execute wrappers and return the stack that remove them."""
+        stack = self._wrap_connections(metrics)
+        stack.__enter__()
+        return stack
+
+    def _finish(self, request, response, metrics):
+        """Log the numbers of the request and add the Server-Timing header."""
+        options = metrics_options()
+        total_ms = metrics.elapsed * 1000
+        db_ms = metrics.db_time * 1000
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(db_ms, 2),
+            'queries': metrics.queries,
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }, sort_keys=True))
+
+        if metrics.capture_sql and total_ms >= options['SLOW_REQUEST_MS']:
+            slow_logger.warning(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'total_ms': round(total_ms, 2),
+                'queries': [{'ms': ms, 'sql': sql} for ms, sql in metrics.sql],
+            }, sort_keys=True))
+
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = ', '.join([
+                'total;dur={:.2f}'.format(total_ms),
+                'db;dur={:.2f};desc="{} queries"'.format(db_ms, metrics.queries),
+                'cache;desc="{} hits {} misses"'.format(metrics.cache_hits, metrics.cache_misses),
+            ])
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Keep the reads of a client on the primary right after it wrote.
+
+    POST requests and requests with the sticky cookie read from the primary. A request that
+    wrote a poll model set the cookie for POLLS_REPLICA_STICKY_SECONDS, so
+    the results page after a vote show the vote even if the replicas lag.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keep the next handler, async if it is a coroutine."""
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Route the reads of the request."""
+        if self.is_async:
+            return self.__acall__(request)
+        state = self._state(request)
+        token = routers.activate(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.deactivate(token)
+        return self._finish(response, state)
+
+    async def __acall__(self, request):
+        """Route the reads of the request of an async handler."""
+        state = self._state(request)
+        token = routers.activate(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.deactivate(token)
+        return self._finish(response, state)
+
+    @staticmethod
+    def _state(request):
+        """Return the read state, on the primary for writes and sticky clients."""
+        return ReadState(sticky=STICKY_COOKIE in request.COOKIES or request.method not in SAFE_METHODS)
+
+    @staticmethod
+    def _finish(response, state):
+        """Set the sticky cookie if the request wrote."""
+        if state.wrote and routers.replicas():
+            response.set_cookie(STICKY_COOKIE, '1', max_age=routers.sticky_seconds(), httponly=True,
+                                samesite='Lax')
+        return response
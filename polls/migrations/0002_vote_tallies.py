@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_tallies(apps, schema_editor):
+    """Count the existing Vote rows into the new tally fields."""
+    Question = apps.get_model('polls', 'Question')
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+
+    def counted(field):
+        votes = Vote.objects.filter(**{field: OuterRef('pk')}).order_by()
+        votes = votes.values(field).annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(votes), Value(0))
+
+    Question.objects.update(total_votes=counted('question'))
+    Choice.objects.update(votes=counted('choice'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='votes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='total_votes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_tallies, migrations.RunPython.noop),
+    ]
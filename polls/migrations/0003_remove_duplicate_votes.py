@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote of each user on each question and fix the tallies."""
+    Question = apps.get_model('polls', 'Question')
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+
+    duplicates = (Vote.objects.filter(user__isnull=False).values('question', 'user')
+                  .annotate(n=Count('pk'), latest=Max('pk')).filter(n__gt=1).order_by())
+    questions = set()
+    for row in duplicates.iterator():
+        Vote.objects.filter(question=row['question'], user=row['user']).exclude(pk=row['latest']).delete()
+        questions.add(row['question'])
+
+    for question in Question.objects.filter(pk__in=questions):
+        Question.objects.filter(pk=question.pk).update(total_votes=question.vote_set.count())
+        for choice in Choice.objects.filter(question=question):
+            Choice.objects.filter(pk=choice.pk).update(votes=choice.vote_set.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_vote_tallies'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+    ]
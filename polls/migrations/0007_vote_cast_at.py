@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_pendingvote'),
+    ]
+
+    # Add the column without default first, so existing votes keep an unknown (NULL) time.
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='cast_at',
+            field=models.DateTimeField(null=True, verbose_name='time voted'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='cast_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True, verbose_name='time voted'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:02
+
+from django.db import migrations
+
+DEFAULT_INDEX_SQL = 'CREATE INDEX question_text_prefix_idx ON polls_question (question_text)'
+INDEX_SQL = {
+    # LIKE 'prefix%' of istartswith use an index with the NOCASE collation.
+    'sqlite': 'CREATE INDEX question_text_prefix_idx ON polls_question (question_text COLLATE NOCASE)',
+    # UPPER(question_text) LIKE UPPER('prefix%') of istartswith.
+    'postgresql': ('CREATE INDEX question_text_prefix_idx ON polls_question '
+                   '(UPPER(question_text::text) text_pattern_ops)'),
+}
+
+
+def create_prefix_index(apps, schema_editor):
+    """Create the index of the case insensitive prefix search of the question text."""
+    schema_editor.execute(INDEX_SQL.get(schema_editor.connection.vendor, DEFAULT_INDEX_SQL))
+
+
+def drop_prefix_index(apps, schema_editor):
+    """Drop the prefix search index."""
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX question_text_prefix_idx ON polls_question')
+    else:
+        schema_editor.execute('DROP INDEX question_text_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_closed_results'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+    ]
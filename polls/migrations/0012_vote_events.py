@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_events(apps, schema_editor):
+    """Append one event per existing vote, at the time it was cast.
+
+    The switches before the event log are not known, only the current votes.
+    """
+    VoteEvent = apps.get_model('polls', 'VoteEvent')
+    for model_name in ('Vote', 'ArchivedVote'):
+        votes = apps.get_model('polls', model_name).objects.filter(question__isnull=False, choice__isnull=False)
+        rows = votes.order_by('pk').values_list('question_id', 'choice_id', 'user_id', 'cast_at')
+        batch = []
+        for question_id, choice_id, user_id, cast_at in rows.iterator(chunk_size=2000):
+            batch.append(VoteEvent(question_id=question_id, choice_id=choice_id, user_id=user_id,
+                                   created_at=cast_at or django.utils.timezone.now()))
+            if len(batch) == 2000:
+                VoteEvent.objects.bulk_create(batch)
+                batch = []
+        VoteEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_question_text_prefix_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EventTally',
+            fields=[
+                ('choice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='event_tally', serialize=False, to='polls.choice')),
+                ('votes', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('previous_choice', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='left_events', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'created_at'], name='voteevent_question_time_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0013_vote_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventcheckpoint',
+            name='gaps',
+            field=models.JSONField(default=list),
+        ),
+    ]
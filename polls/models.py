@@ -2,16 +2,73 @@
 import datetime
 
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+class QuestionQuerySet(models.QuerySet):
+    """Time window filters of Question that run in SQL."""
+
+    def published(self, now=None):
+        """Questions whose pub_date has passed, like Question.is_published."""
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def open(self, now=None):
+        """Questions that can be voted now, like Question.can_vote."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__gte=now)
+
+    def recent(self, now=None):
+        """Questions published in the last day, like Question.was_published_recently."""
+        now = now or timezone.now()
+        return self.filter(pub_date__gte=now - datetime.timedelta(days=1), pub_date__lte=now)
+
+    def next_transition(self, now=None):
+        """Return the next time a question open or close, None if no question will.
+
+        Each half is a MIN over an indexed column.
+        """
+        now = now or timezone.now()
+        opening = self.filter(pub_date__gt=now).aggregate(next=models.Min('pub_date'))['next']
+        closing = self.filter(end_date__gt=now).aggregate(next=models.Min('end_date'))['next']
+        return min((time for time in (opening, closing) if time is not None), default=None)
+
+    def with_tally(self):
+        """Annotate ``tally``, total_votes plus the counter shards of its choices not compacted yet.
+
+        A switch add -1 and +1 to the shards, so their sum is the new votes only.
+        """
+        shards = (ChoiceShard.objects.filter(choice__question=models.OuterRef('pk')).order_by()
+                  .values('choice__question').annotate(total=models.Sum('count')).values('total'))
+        return self.annotate(tally=models.F('total_votes') + Coalesce(models.Subquery(shards), 0))
+
+    async def anext_transition(self, now=None):
+        """Async version of next_transition."""
+        now = now or timezone.now()
+        opening = (await self.filter(pub_date__gt=now).aaggregate(next=models.Min('pub_date')))['next']
+        closing = (await self.filter(end_date__gt=now).aaggregate(next=models.Min('end_date')))['next']
+        return min((time for time in (opening, closing) if time is not None), default=None)
+
+
 class Question(models.Model):
     """All about the question ex: published time."""
 
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('ending date')
+    total_votes = models.PositiveIntegerField(default=0)
+    # Results written once the poll closed, with the end_date they were taken at.
+    final_results = models.JSONField(null=True, blank=True, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='question_pub_date_id_idx'),
+            models.Index(fields=['pub_date', 'end_date'], name='question_pub_end_idx'),
+            models.Index(fields=['end_date'], name='question_end_date_idx'),
+        ]
 
     def __str__(self):
         """Sent the question out."""
@@ -48,18 +105,137 @@ class Question(models.Model):
         return self.pub_date <= now <= self.end_date
 
 
+class ChoiceQuerySet(models.QuerySet):
+    """Vote tallies of Choice with the counter shards added."""
+
+    def with_tally(self):
+        """Annotate ``tally``, the compacted votes plus the shards not compacted yet."""
+        shards = (ChoiceShard.objects.filter(choice=models.OuterRef('pk')).order_by()
+                  .values('choice').annotate(total=models.Sum('count')).values('total'))
+        return self.annotate(tally=models.F('votes') + Coalesce(models.Subquery(shards), 0))
+
+
 class Choice(models.Model):
     """Choice for the question."""
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    votes = models.PositiveIntegerField(default=0)
+
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
         """Sent the choice for vote in each question."""
         return self.choice_text
 
+
+class ChoiceShard(models.Model):
+    """One shard of the vote counter of a choice.
+
+    With POLLS_COUNTERS['SHARDS'] set, votes add to one of the shard rows
+    instead of Choice.votes and Question.total_votes, so the votes of a
+    popular poll do not all wait for the same row lock. compact_counters
+    fold the shards back into both.
+    """
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'], name='unique_choice_shard'),
+        ]
+
 class Vote(models.Model):
     """Vote of each user on each question."""
     question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, default=1)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE, null=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    cast_at = models.DateTimeField('time voted', default=timezone.now, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'user'], name='unique_vote_per_user'),
+        ]
+
+
+class ArchivedVote(models.Model):
+    """Vote of a long closed poll, moved out of the Vote table by archive_votes.
+
+    The id is the id the row had in Vote.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, null=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
+    cast_at = models.DateTimeField('time voted', null=True)
+
+
+class VoteEvent(models.Model):
+    """One vote cast or switched, appended next to every write of Vote.
+
+    A switch carry the choice the vote left in previous_choice, so the
+    tally of a choice is its events minus the events that left it.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    previous_choice = models.ForeignKey(Choice, on_delete=models.SET_NULL, null=True, related_name='left_events')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', 'created_at'], name='voteevent_question_time_idx'),
+        ]
+
+
+class EventTally(models.Model):
+    """Votes of a choice materialized from the VoteEvent rows.
+
+    Kept apart from Choice, so the materializer never wait for the row
+    locks of the votes.
+    """
+
+    choice = models.OneToOneField(Choice, on_delete=models.CASCADE, primary_key=True, related_name='event_tally')
+    votes = models.IntegerField(default=0)
+
+
+class VoteBucket(models.Model):
+    """Net votes of a choice in one minute or one hour, rolled up from the VoteEvent rows."""
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    # Length of the bucket in seconds, 60 or 3600.
+    size = models.PositiveIntegerField()
+    start = models.DateTimeField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'size', 'start'], name='unique_vote_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'size', 'start'], name='votebucket_timeline_idx'),
+        ]
+
+
+class EventCheckpoint(models.Model):
+    """Id of the last VoteEvent applied by a consumer of the event log."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    # [low, high, seen] ranges of ids below position not applied yet: their
+    # transactions may still commit. A range is dropped GAP_TIMEOUT seconds after seen.
+    gaps = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class PendingVote(models.Model):
+    """Vote intent waiting in the queue to be written as a Vote."""
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    queued_at = models.DateTimeField(default=timezone.now)
@@ -0,0 +1,118 @@
+"""Module for keyset pagination of questions on (pub_date, id) and the admin paginator."""
+import datetime
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(question):
+    """Return the cursor that point after the question.
+
+    The cursor is the pub_date in microseconds and the id of the question.
+    """
+    return _cursor(question.pub_date, question.pk)
+
+
+def _cursor(pub_date, pk):
+    """Return the cursor of pub_date and pk."""
+    delta = pub_date - EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+    return '{}-{}'.format(microseconds, pk)
+
+
+def decode_cursor(cursor):
+    """Return the (pub_date, id) of the cursor or None if the cursor is invalid."""
+    try:
+        microseconds, _, pk = cursor.rpartition('-')
+        return EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def _seek(queryset, cursor):
+    """Return the queryset after the cursor, newest first."""
+    key = decode_cursor(cursor) if cursor else None
+    if key is not None:
+        pub_date, pk = key
+        queryset = queryset.filter(Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+    return queryset.order_by('-pub_date', '-pk')
+
+
+def _split(page, size):
+    """Return the page without the extra question and the next cursor."""
+    if len(page) > size:
+        return page[:size], encode_cursor(page[size - 1])
+    return page, None
+
+
+def keyset_page(queryset, cursor=None, size=20):
+    """Return one page of questions newest first and the cursor of the next page.
+
+    Seek past the cursor with an indexed range on (pub_date, id) instead of an
+    OFFSET, so every page cost the same however deep it is.
+
+    Args:
+        queryset: questions to paginate.
+        cursor: cursor returned with the previous page, None for the first page.
+        size: number of questions in one page.
+
+    Returns:
+        Tuple of the list of questions and the next cursor, or None on the last page.
+    """
+    return _split(list(_seek(queryset, cursor)[:size + 1]), size)
+
+
+async def akeyset_page(queryset, cursor=None, size=20):
+    """Async version of keyset_page."""
+    return _split([question async for question in _seek(queryset, cursor)[:size + 1]], size)
+
+
+def keyset_values(queryset, fields, cursor=None, size=20):
+    """Like keyset_page, but return the .values() dicts of fields instead of questions.
+
+    fields must include 'id' and 'pub_date', the next cursor is built from them.
+    """
+    page = list(_seek(queryset, cursor).values(*fields)[:size + 1])
+    if len(page) > size:
+        return page[:size], _cursor(page[size - 1]['pub_date'], page[size - 1]['id'])
+    return page, None
+
+
+def estimate_count(queryset):
+    """Return an estimate of the number of rows in the table of queryset.
+
+    PostgreSQL keep one in its statistics. Elsewhere the largest id is read
+    from the primary key index, which count the deleted rows too.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return max(0, row[0]) if row else 0
+    return queryset.model._default_manager.using(queryset.db).aggregate(top=Max('pk'))['top'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimate the count of a large unfiltered table.
+
+    A COUNT(*) scan the whole table, so without a filter and above
+    ``threshold`` rows the count is estimate_count. Filtered lists are
+    counted exactly.
+    """
+
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        """Return the estimated or the exact number of objects."""
+        if hasattr(self.object_list, 'query') and not self.object_list.query.where:
+            estimate = estimate_count(self.object_list)
+            if estimate > self.threshold:
+                return estimate
+        return super().count
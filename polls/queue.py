@@ -0,0 +1,189 @@
+"""Module for the write-behind vote queue.
+
+In queue mode the vote view only insert a PendingVote row and answer the
+user. A worker later flush the queue in batches: it keep one intent per
+user and question, write the votes with bulk_create and bulk_update and
+move the tallies with one UPDATE per touched choice and question.
+
+The queue rows are deleted in the same transaction as the votes are
+written, so a crashed flush is replayed (at-least-once). Replaying is
+safe because a flush set the vote of a user to a choice, it never add.
+"""
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+
+from .models import PendingVote, Vote, VoteEvent
+from .voting import bump_choices, bump_question, results_changed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_OPTIONS = {
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'LAST_WRITE_WINS': True,
+}
+
+
+def ingestion_mode():
+    """Return how votes are written.
+
+    Returns:
+        'sync' to write in the request, 'queue' to queue for the process_vote_queue
+        command, 'thread' to queue for a flush thread inside the web process.
+    """
+    return getattr(settings, 'POLLS_VOTE_INGESTION', 'sync')
+
+
+def queue_options():
+    """Return the queue options merged over the defaults."""
+    return {**DEFAULT_QUEUE_OPTIONS, **getattr(settings, 'POLLS_VOTE_QUEUE', {})}
+
+
+def enqueue_vote(question, user, choice):
+    """Record the vote intent of user with one INSERT."""
+    PendingVote.objects.create(question=question, user=user, choice=choice)
+    if ingestion_mode() == 'thread':
+        start_worker()
+
+
+async def aenqueue_vote(question, user, choice):
+    """Async version of enqueue_vote."""
+    await PendingVote.objects.acreate(question=question, user=user, choice=choice)
+    if ingestion_mode() == 'thread':
+        start_worker()
+
+
+def flush_vote_queue(batch_size=None):
+    """Write one batch of queued votes.
+
+    Args:
+        batch_size: maximum number of queued rows to take, BATCH_SIZE if not given.
+
+    Returns:
+        Number of queued rows that were processed.
+    """
+    options = queue_options()
+    batch_size = batch_size or options['BATCH_SIZE']
+    using = router.db_for_write(Vote)
+
+    with transaction.atomic(using=using):
+        pending = PendingVote.objects.using(using).order_by('pk')
+        if connections[using].features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        pending = pending.values_list('pk', 'question_id', 'user_id', 'choice_id', 'queued_at')
+        pending = list(pending[:batch_size])
+        if not pending:
+            return 0
+
+        intents = {}
+        for _, question_id, user_id, choice_id, queued_at in pending:
+            key = (question_id, user_id)
+            if options['LAST_WRITE_WINS'] or key not in intents:
+                intents[key] = (choice_id, queued_at)
+
+        questions = {question_id for question_id, _ in intents}
+        users = {user_id for _, user_id in intents}
+        existing = Vote.objects.using(using).select_for_update().filter(question_id__in=questions,
+                                                                        user_id__in=users).order_by('pk')
+        existing = {(vote.question_id, vote.user_id): vote for vote in existing}
+
+        created, switched, events = [], [], []
+        choice_delta, question_delta = Counter(), Counter()
+        live_deltas = {question_id: Counter() for question_id in questions}
+        for (question_id, user_id), (choice_id, queued_at) in intents.items():
+            vote = existing.get((question_id, user_id))
+            if vote is None:
+                created.append(Vote(question_id=question_id, user_id=user_id, choice_id=choice_id,
+                                    cast_at=queued_at))
+                events.append(VoteEvent(question_id=question_id, user_id=user_id, choice_id=choice_id,
+                                        created_at=queued_at))
+                question_delta[question_id] += 1
+                choice_delta[choice_id] += 1
+                live_deltas[question_id][choice_id] += 1
+            elif vote.choice_id != choice_id and options['LAST_WRITE_WINS']:
+                if vote.choice_id is not None:
+                    choice_delta[vote.choice_id] -= 1
+                    live_deltas[question_id][vote.choice_id] -= 1
+                choice_delta[choice_id] += 1
+                live_deltas[question_id][choice_id] += 1
+                events.append(VoteEvent(question_id=question_id, user_id=user_id, choice_id=choice_id,
+                                        previous_choice_id=vote.choice_id, created_at=queued_at))
+                vote.choice_id = choice_id
+                vote.cast_at = queued_at
+                switched.append(vote)
+
+        Vote.objects.using(using).bulk_create(created, batch_size=batch_size)
+        Vote.objects.using(using).bulk_update(switched, ['choice', 'cast_at'], batch_size=batch_size)
+        VoteEvent.objects.using(using).bulk_create(events, batch_size=batch_size)
+        # Questions then choices, each in ascending id order, the same lock order as cast_vote.
+        for question_id in sorted(question_delta):
+            bump_question(question_id, question_delta[question_id])
+        bump_choices(choice_delta)
+        PendingVote.objects.using(using).filter(pk__in=[row[0] for row in pending]).delete()
+
+        for question_id, deltas in live_deltas.items():
+            if deltas:
+                results_changed(question_id, dict(deltas), using)
+    return len(pending)
+
+
+def drain_vote_queue(batch_size=None):
+    """Flush batches until the queue is empty.
+
+    Returns:
+        Number of queued rows that were processed.
+    """
+    total = 0
+    while True:
+        flushed = flush_vote_queue(batch_size)
+        total += flushed
+        if not flushed:
+            return total
+
+
+class VoteQueueWorker(threading.Thread):
+    """Daemon thread that drain the vote queue every FLUSH_INTERVAL seconds."""
+
+    def __init__(self, interval=None, batch_size=None):
+        """Set up the worker with the queue options."""
+        super().__init__(name='polls-vote-queue', daemon=True)
+        options = queue_options()
+        self.interval = interval or options['FLUSH_INTERVAL']
+        self.batch_size = batch_size or options['BATCH_SIZE']
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Drain the queue until stopped."""
+        while not self.stopped.wait(self.interval):
+            try:
+                drain_vote_queue(self.batch_size)
+            except Exception:
+                logger.exception('Vote queue flush failed, the batch will be retried')
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        """Stop the worker after the current flush."""
+        self.stopped.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Start the flush thread of this process once.
+
+    Returns:
+        The running worker.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = VoteQueueWorker()
+            _worker.start()
+    return _worker
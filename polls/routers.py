@@ -0,0 +1,87 @@
+"""Module for sending the poll reads to read replicas.
+
+The reads of the poll models go to one of the POLLS_REPLICAS aliases and
+every write go to the primary. POST requests read from the primary, and
+after a request wrote a poll model the middleware set a
+short sticky cookie so the next requests of that client read from the
+primary too, until the replicas have caught up with the vote.
+
+Sessions, users and the vote queue always stay on the primary: they are
+read right after they are written. Outside of a request (migrations,
+management commands, the vote worker) every read go to the primary too.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'polls_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_MODELS = {'question', 'choice', 'choiceshard', 'vote', 'archivedvote', 'voteevent', 'votebucket'}
+
+_state = contextvars.ContextVar('polls_replica_state', default=None)
+
+
+class ReadState:
+    """Where the reads of the current request go."""
+
+    def __init__(self, sticky=False):
+        """Start reading from the primary if sticky."""
+        self.sticky = sticky
+        self.wrote = False
+
+    @property
+    def pinned(self):
+        """Return True if the reads must go to the primary."""
+        return self.sticky or self.wrote
+
+
+def activate(state):
+    """Make state the read state of the current request.
+
+    Returns:
+        Token for deactivate.
+    """
+    return _state.set(state)
+
+
+def deactivate(token):
+    """Restore the read state from before activate."""
+    _state.reset(token)
+
+
+def replicas():
+    """Return the aliases of the read replicas."""
+    return getattr(settings, 'POLLS_REPLICAS', [])
+
+
+def sticky_seconds():
+    """Return how long a client read from the primary after its vote."""
+    return getattr(settings, 'POLLS_REPLICA_STICKY_SECONDS', 10)
+
+
+class ReplicaRouter:
+    """Route the poll reads to the replicas and the writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        """Return a random replica for the poll models inside a request, the primary when pinned."""
+        state = _state.get()
+        if (not replicas() or state is None or state.pinned
+                or model._meta.app_label != 'polls' or model._meta.model_name not in REPLICA_MODELS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        """Return the primary and pin the reads of the request to it."""
+        state = _state.get()
+        if state is not None and model._meta.app_label == 'polls':
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations across the primary and the replicas, they hold the same rows."""
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,39 @@
+"""Module for the signal receivers of the polls app."""
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import bump_catalog_version, bump_question_version, bump_results_version
+from .models import Question, Choice
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    """Invalidate the cached results and the results snapshot when a choice is added, edited or removed."""
+    Question.objects.filter(pk=instance.question_id).exclude(final_results=None).update(final_results=None)
+    transaction.on_commit(lambda: bump_results_version(instance.question_id))
+    transaction.on_commit(lambda: bump_question_version(instance.question_id))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Invalidate the cached question list and the question version when a question is added, edited or removed."""
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(lambda pk=instance.pk: bump_question_version(pk))
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Run the POLLS_SQLITE_PRAGMAS on every new SQLite connection.
+
+    WAL let readers run beside the single writer and busy_timeout make a
+    writer wait for the lock instead of failing with "database is locked".
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'POLLS_SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
@@ -0,0 +1,9 @@
+"""URLconf that serve the poll pages with the async views."""
+from django.urls import include, path
+
+from polls import async_views
+from polls.urls import poll_patterns
+
+urlpatterns = [
+    path('polls/', include((poll_patterns(async_views), 'polls'))),
+]
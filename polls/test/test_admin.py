@@ -0,0 +1,141 @@
+"""Module for test the admin changelists of the questions and the votes."""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question, Vote
+from polls.pagination import EstimatedCountPaginator
+from polls.voting import cast_vote
+from .test_detail import create_question
+
+
+class AdminChangelistTests(TestCase):
+    """Test the changelists run the same queries whatever the number of rows."""
+
+    def setUp(self):
+        """Set up a superuser and questions with votes."""
+        self.admin = User.objects.create_superuser(username='admin', password='secret')
+        self.client.force_login(self.admin)
+        self.users = [User.objects.create_user(username='user{}'.format(number)) for number in range(3)]
+
+    def add_question(self, text):
+        """Add a question with two choices and a vote of every user."""
+        question = create_question(question_text=text, days=-1)
+        choice = question.choice_set.create(choice_text='First')
+        question.choice_set.create(choice_text='Second')
+        for user in self.users:
+            cast_vote(question, user, choice)
+        return question
+
+    def queries(self, url, data=None):
+        """Return the number of queries of one GET."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_question_changelist(self):
+        """Choice and vote counts come from the one annotated query."""
+        url = reverse('admin:polls_question_changelist')
+        self.add_question('What is first?')
+        once = self.queries(url)
+        for number in range(4):
+            self.add_question('What is {}?'.format(number))
+        self.assertEqual(self.queries(url), once)
+        response = self.client.get(url)
+        self.assertContains(response, '<td class="field-choice_count">2</td>', count=5, html=True)
+        self.assertContains(response, '<td class="field-total_votes">3</td>', count=5, html=True)
+
+    def test_question_prefix_search(self):
+        """Search match the start of the question text, ignoring case, through the prefix index."""
+        self.add_question('What is first?')
+        self.add_question('So what?')
+        response = self.client.get(reverse('admin:polls_question_changelist'), {'q': 'wHAT'})
+        self.assertContains(response, 'What is first?')
+        self.assertNotContains(response, 'So what?')
+        if connection.vendor == 'sqlite':
+            search = Question.objects.filter(question_text__istartswith='wha').values('pk')
+            sql, params = search.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            self.assertIn('question_text_prefix_idx', plan)
+
+    def test_vote_changelist(self):
+        """The vote list select the related rows in the same query."""
+        url = reverse('admin:polls_vote_changelist')
+        self.add_question('What is first?')
+        once = self.queries(url)
+        for number in range(4):
+            self.add_question('What is {}?'.format(number))
+        self.assertEqual(self.queries(url), once)
+        response = self.client.get(url, {'q': 'user1'})
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_votes_read_only(self):
+        """Votes can be viewed but not added, changed or deleted in the admin."""
+        question = self.add_question('What is first?')
+        vote = Vote.objects.filter(question=question).first()
+        self.assertEqual(self.client.get(reverse('admin:polls_vote_add')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:polls_vote_delete', args=(vote.pk,))).status_code, 403)
+        change = reverse('admin:polls_vote_change', args=(vote.pk,))
+        self.assertEqual(self.client.get(change).status_code, 200)
+        self.client.post(change, {'question': question.pk, 'choice': '', 'user': vote.user_id})
+        self.assertEqual(Vote.objects.get(pk=vote.pk).choice_id, vote.choice_id)
+
+    def test_save_keep_tallies(self):
+        """Saving a question and its choices never write the tallies back."""
+        question = self.add_question('What is first?')
+        first, second = question.choice_set.order_by('pk')
+        pub_date = timezone.localtime(question.pub_date)
+        end_date = timezone.localtime(question.end_date)
+        data = {
+            'question_text': 'What is second?',
+            'pub_date_0': pub_date.strftime('%Y-%m-%d'), 'pub_date_1': pub_date.strftime('%H:%M:%S'),
+            'end_date_0': end_date.strftime('%Y-%m-%d'), 'end_date_1': end_date.strftime('%H:%M:%S'),
+            'choice_set-TOTAL_FORMS': 3, 'choice_set-INITIAL_FORMS': 2,
+            'choice_set-0-id': first.pk, 'choice_set-0-question': question.pk, 'choice_set-0-choice_text': 'One',
+            'choice_set-1-id': second.pk, 'choice_set-1-question': question.pk, 'choice_set-1-choice_text': 'Two',
+            'choice_set-2-question': question.pk, 'choice_set-2-choice_text': 'Three',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:polls_question_change', args=(question.pk,)), data)
+        self.assertEqual(response.status_code, 302)
+        # A saved choice also drop the results snapshot, through its signal.
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE') and 'SET "final_results" = NULL' not in query['sql']]
+        self.assertEqual(len(updates), 3)
+        for sql in updates:
+            self.assertNotIn('"votes"', sql)
+            self.assertNotIn('"total_votes"', sql)
+            self.assertNotIn('"final_results"', sql)
+        self.assertEqual(list(question.choice_set.order_by('pk').values_list('choice_text', 'votes')),
+                         [('One', 3), ('Two', 0), ('Three', 0)])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Test the paginator estimate the unfiltered count above the threshold."""
+
+    def setUp(self):
+        """Set up votes and delete some of them."""
+        question = create_question(question_text='Counted question.', days=-1)
+        choice = question.choice_set.create(choice_text='First')
+        for number in range(6):
+            cast_vote(question, User.objects.create_user(username='user{}'.format(number)), choice)
+        Vote.objects.filter(pk__in=Vote.objects.order_by('pk').values('pk')[:2]).delete()
+
+    def test_estimate(self):
+        """Unfiltered above the threshold is estimated, filtered is counted."""
+        paginator = EstimatedCountPaginator(Vote.objects.order_by('pk'), 2)
+        paginator.threshold = 0
+        self.assertEqual(paginator.count, Vote.objects.order_by('-pk').first().pk)
+        paginator = EstimatedCountPaginator(Vote.objects.filter(user__username='user5').order_by('pk'), 2)
+        paginator.threshold = 0
+        self.assertEqual(paginator.count, 1)
+
+    def test_exact_below_threshold(self):
+        """Small tables are counted exactly."""
+        self.assertEqual(EstimatedCountPaginator(Vote.objects.order_by('pk'), 2).count, 4)
@@ -0,0 +1,129 @@
+"""Module for test the JSON read API."""
+import datetime
+import gzip
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.caching import bump_question_version
+from polls.models import Question
+from polls.voting import cast_vote
+from .test_detail import create_question
+
+
+class QuestionApiTests(TestCase):
+    """Test the question list and detail payloads and their ETags."""
+
+    def setUp(self):
+        """Set up published questions and a future one."""
+        cache.clear()
+        self.questions = [create_question(question_text='Question {}.'.format(number), days=-number - 1)
+                          for number in range(3)]
+        self.questions[0].choice_set.create(choice_text='First')
+        create_question(question_text='Future question.', days=5)
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=2)
+    def test_list_pages(self):
+        """The list is paginated newest first with the next cursor."""
+        url = reverse('polls:api_questions')
+        data = self.client.get(url).json()
+        self.assertEqual([question['question_text'] for question in data['questions']],
+                         ['Question 0.', 'Question 1.'])
+        data = self.client.get(url, {'after': data['next']}).json()
+        self.assertEqual([question['question_text'] for question in data['questions']], ['Question 2.'])
+        self.assertIsNone(data['next'])
+
+    def test_list_not_modified(self):
+        """The same ETag answer 304 without a query until a question is saved."""
+        url = reverse('polls:api_questions')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_question(question_text='New question.', days=-1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail(self):
+        """The detail has the choices, a new choice change the ETag."""
+        url = reverse('polls:api_question', args=(self.questions[0].id,))
+        response = self.client.get(url)
+        self.assertEqual([choice['choice_text'] for choice in response.json()['choices']], ['First'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.questions[0].choice_set.create(choice_text='Second')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_detail_future(self):
+        """A question not published yet is not found."""
+        future = create_question(question_text='Other future question.', days=5)
+        self.assertEqual(self.client.get(reverse('polls:api_question', args=(future.id,))).status_code, 404)
+
+    def test_gzip(self):
+        """Clients accepting gzip get the compressed JSON."""
+        for number in range(10):
+            create_question(question_text='Padding question {}.'.format(number), days=-1)
+        response = self.client.get(reverse('polls:api_questions'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['questions']), 13)
+        etag = response['ETag']
+        response = self.client.get(reverse('polls:api_questions'), HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class ResultsApiTests(TestCase):
+    """Test the results payload follow the votes."""
+
+    def setUp(self):
+        """Set up a question with a choice."""
+        cache.clear()
+        self.question = create_question(question_text='Results question.', days=-1)
+        self.choice = self.question.choice_set.create(choice_text='First')
+        self.url = reverse('polls:api_results', args=(self.question.id,))
+
+    def test_vote_change_etag(self):
+        """A vote change the ETag and the votes."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), {'id': self.question.id, 'final': False,
+                                           'results': [{'id': self.choice.id, 'choice_text': 'First', 'votes': 0}]})
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.question, User.objects.create_user(username='Marry'), self.choice)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['results'][0]['votes'], 1)
+
+    @override_settings(POLLS_RESULTS_CACHE_MODE='ttl')
+    def test_ttl_etag_follow_cached_results(self):
+        """In ttl mode the ETag change with the cached results, not with the vote."""
+        response = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.question, User.objects.create_user(username='Marry'), self.choice)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        cache.delete('polls:results:{}:ttl'.format(self.question.pk))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['results'][0]['votes'], 1)
+
+    def test_final_change_etag(self):
+        """The ETag change once the results are final, so a revalidating client see ``final``."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(seconds=30))
+        bump_question_version(self.question.pk)
+        response = self.client.get(self.url)
+        self.assertFalse(response.json()['final'])
+        with self.settings(POLLS_CLOSED_RESULTS={'GRACE': 0}):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['final'])
+
+    def test_unpublished_not_found(self):
+        """The results of a question not published yet are not served."""
+        future = create_question(question_text='Future question.', days=5)
+        self.assertEqual(self.client.get(reverse('polls:api_results', args=(future.id,))).status_code, 404)
+
+    def test_post_not_allowed(self):
+        """The API is read only."""
+        self.assertEqual(self.client.post(self.url).status_code, 405)
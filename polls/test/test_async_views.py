@@ -0,0 +1,69 @@
+"""Module for test the async versions of the poll views."""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.models import Choice, Vote
+from .test_detail import create_question
+
+
+@override_settings(ROOT_URLCONF='polls.test.async_urls')
+class AsyncViewTests(TestCase):
+    """Test the async views render the same pages as the sync views."""
+
+    def setUp(self):
+        """Set up user, question and choices for testing."""
+        cache.clear()
+        self.user = User.objects.create_user(username='Marry', password='secret')
+        self.question = create_question(question_text='Async question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.question.choice_set.create(choice_text='Second')
+
+    async def test_index(self):
+        """Index list the published questions."""
+        await sync_to_async(create_question)(question_text='Future question.', days=5)
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertEqual([question.question_text for question in response.context['latest_question_list']],
+                         ['Async question.'])
+
+    async def test_detail(self):
+        """Detail show the choices to a logged in user."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, 'Second')
+
+    async def test_detail_need_login(self):
+        """Detail redirect to the login page when not logged in."""
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_vote_and_results(self):
+        """Vote is written and shown on the results page."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)),
+                                                {'choice': self.first.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual((await Vote.objects.aget(user=self.user)).choice_id, self.first.id)
+        self.assertEqual((await Choice.objects.aget(pk=self.first.pk)).votes, 1)
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual([choice['choice_text'] for choice in response.context['results']], ['First', 'Second'])
+
+    async def test_vote_without_choice(self):
+        """Vote without a choice show the error on the detail page."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)), {})
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+
+    @override_settings(POLLS_THROTTLE={'RATES': {'vote_user': '2/min'}})
+    async def test_vote_throttled(self):
+        """Async vote suppress the repeat and refuse the votes over the limit."""
+        await self.async_client.aforce_login(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        for _ in range(2):
+            response = await self.async_client.post(url, {'choice': self.first.id})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual((await Choice.objects.aget(pk=self.first.pk)).votes, 1)
+        response = await self.async_client.post(url, {'choice': self.first.id})
+        self.assertEqual(response.status_code, 429)
@@ -0,0 +1,85 @@
+"""Module for test the results snapshots of closed polls and the vote archive."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.caching import get_results
+from polls.models import ArchivedVote, Question, Vote
+from polls.voting import archive_votes, cast_vote, finalize_closed_polls, recount_votes
+
+
+class ClosedResultsTests(TestCase):
+    """Test the results of a closed poll are written once and served from the snapshot."""
+
+    def setUp(self):
+        """Set up a poll closed forty days ago with two votes."""
+        cache.clear()
+        now = timezone.now()
+        self.question = Question.objects.create(question_text='Closed question.',
+                                                pub_date=now - datetime.timedelta(days=50),
+                                                end_date=now - datetime.timedelta(days=40))
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.users = [User.objects.create_user(username='user{}'.format(number)) for number in range(2)]
+        cast_vote(self.question, self.users[0], self.first)
+        cast_vote(self.question, self.users[1], self.first)
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_snapshot(self):
+        """The first read write the snapshot, later reads do not count the votes."""
+        self.assertEqual([choice['votes'] for choice in get_results(self.question)], [2, 0])
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertIsNotNone(question.final_results)
+        with self.assertNumQueries(0):
+            self.assertEqual([choice['votes'] for choice in get_results(question)], [2, 0])
+
+    def test_reopen(self):
+        """A snapshot taken at another end date is not used."""
+        get_results(self.question)
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        self.question.save()
+        cast_vote(self.question, User.objects.create_user(username='late'), self.second)
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertEqual([choice['votes'] for choice in get_results(question)], [2, 1])
+
+    @override_settings(POLLS_LIVE={'ENABLED': True})
+    def test_results_page_headers(self):
+        """The results page of a closed poll is public, long lived and without the live stream."""
+        response = self.client.get(self.url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+        self.assertNotContains(response, 'EventSource')
+
+    def test_finalize_closed_polls(self):
+        """finalize_closed_polls write the missing snapshots once."""
+        self.assertEqual(finalize_closed_polls(), 1)
+        self.assertEqual(finalize_closed_polls(), 0)
+
+    def test_archive(self):
+        """Archived votes leave the Vote table, the results and the recount stay the same."""
+        self.assertEqual(archive_votes(batch_size=1), 2)
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(ArchivedVote.objects.count(), 2)
+        question = Question.objects.get(pk=self.question.pk)
+        self.assertEqual([choice['votes'] for choice in get_results(question)], [2, 0])
+        self.assertEqual(recount_votes(fix=False), [])
+
+    def test_archive_keep_recent(self):
+        """Votes of polls closed less than ARCHIVE_AFTER days ago stay in Vote."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(archive_votes(), 0)
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_export_archived(self):
+        """The votes export include the archived votes."""
+        archive_votes()
+        User.objects.create_user(username='Staff', password='secret', is_staff=True)
+        self.client.login(username='Staff', password='secret')
+        response = self.client.get(reverse('polls:results_export', args=(self.question.id,)), {'data': 'votes'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
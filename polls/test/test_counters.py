@@ -0,0 +1,129 @@
+"""Module for test the sharded vote counters."""
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, close_old_connections
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from polls.caching import get_results
+from polls.models import Choice, ChoiceShard, Question, Vote
+from polls.voting import cast_vote, compact_counters, recount_votes
+from .test_detail import create_question
+
+SHARDED = {'SHARDS': 4, 'PICK': 'random'}
+
+
+@override_settings(POLLS_COUNTERS=SHARDED)
+class ShardedCounterTests(TestCase):
+    """Test the tallies read the same with and without shards."""
+
+    def setUp(self):
+        """Set up users, question and choices for testing."""
+        cache.clear()
+        self.users = [User.objects.create_user(username='user{}'.format(number)) for number in range(6)]
+        self.question = create_question(question_text='Sharded question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+
+    def tallies(self):
+        """Return the tallies of both choices."""
+        return dict(Choice.objects.with_tally().values_list('choice_text', 'tally'))
+
+    def test_votes_go_to_shards(self):
+        """Votes and switches land in the shards, the sum is the tally."""
+        for user in self.users:
+            cast_vote(self.question, user, self.first)
+        cast_vote(self.question, self.users[0], self.second)
+        self.assertEqual(Choice.objects.get(pk=self.first.pk).votes, 0)
+        self.assertEqual(self.tallies(), {'First': 5, 'Second': 1})
+        self.assertEqual([choice['votes'] for choice in get_results(self.question)], [5, 1])
+        self.assertEqual(Question.objects.get(pk=self.question.pk).total_votes, 0)
+        self.assertEqual(Question.objects.with_tally().get(pk=self.question.pk).tally, 6)
+
+    def test_compact(self):
+        """Compaction fold the shards into Choice.votes without changing the tallies."""
+        for user in self.users:
+            cast_vote(self.question, user, self.first)
+        cast_vote(self.question, self.users[0], self.second)
+        self.assertGreater(compact_counters(), 0)
+        self.assertFalse(ChoiceShard.objects.exists())
+        self.assertEqual(Choice.objects.get(pk=self.first.pk).votes, 5)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).total_votes, 6)
+        self.assertEqual(self.tallies(), {'First': 5, 'Second': 1})
+
+    @override_settings(POLLS_COUNTERS={'SHARDS': 4, 'PICK': 'user'})
+    def test_pick_by_user(self):
+        """With PICK 'user' the shard is the user id modulo SHARDS."""
+        cast_vote(self.question, self.users[0], self.first)
+        self.assertEqual(ChoiceShard.objects.get().shard, self.users[0].pk % 4)
+
+    def test_first_vote_skip_question_row(self):
+        """A first vote write the vote, its event and one shard, not the question row."""
+        ChoiceShard.objects.bulk_create(ChoiceShard(choice=self.first, shard=shard) for shard in range(4))
+        with self.assertNumQueries(3):
+            cast_vote(self.question, self.users[0], self.first)
+
+    def test_recount(self):
+        """Recount compare the tallies with the shards and fix both, the question total too."""
+        cast_vote(self.question, self.users[0], self.first)
+        ChoiceShard.objects.update(count=7)
+        mismatches = recount_votes(self.question)
+        self.assertEqual([(stored, counted) for _, stored, counted in mismatches], [(7, 1), (7, 1)])
+        self.assertEqual(self.tallies(), {'First': 1, 'Second': 0})
+        self.assertEqual(Question.objects.with_tally().get(pk=self.question.pk).tally, 1)
+        self.assertFalse(ChoiceShard.objects.exists())
+
+
+@override_settings(POLLS_COUNTERS=SHARDED, POLLS_THROTTLE={'ENABLED': False})
+class ShardedCounterConcurrencyTests(TransactionTestCase):
+    """Test concurrent switching votes through the vote view lose no update."""
+
+    def test_no_lost_updates(self):
+        """Every user end with one vote and the tallies match the Vote rows."""
+        users = [User.objects.create_user(username='user{}'.format(number)) for number in range(8)]
+        question = create_question(question_text='Busy question.', days=-1)
+        choices = [question.choice_set.create(choice_text='Choice {}'.format(number)) for number in range(3)]
+        errors = []
+
+        def retry(func, *args):
+            # The SQLite test database refuse concurrent writers, try again.
+            while True:
+                try:
+                    return func(*args)
+                except OperationalError:
+                    time.sleep(0.001)
+
+        clients = {}
+        for user in users:
+            clients[user] = Client()
+            clients[user].force_login(user)
+
+        def worker(user):
+            client = clients[user]
+            rand = random.Random(user.pk)
+            try:
+                for _ in range(15):
+                    retry(client.post, reverse('polls:vote', args=(question.pk,)), {'choice': rand.choice(choices).pk})
+            except Exception as error:
+                errors.append(error)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.count(), len(users))
+        tallies = dict(Choice.objects.with_tally().values_list('pk', 'tally'))
+        for choice in choices:
+            self.assertEqual(tallies[choice.pk], Vote.objects.filter(choice=choice).count())
+        compact_counters()
+        self.assertEqual(dict(Choice.objects.with_tally().values_list('pk', 'tally')), tallies)
+        self.assertEqual(recount_votes(fix=False), [])
@@ -0,0 +1,16 @@
+"""Module for test the database connection profile."""
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+
+class SqlitePragmaTests(TestCase):
+    """Test the POLLS_SQLITE_PRAGMAS run on new connections."""
+
+    def test_busy_timeout(self):
+        """SQLite connection wait for the lock as long as busy_timeout."""
+        if connection.vendor != 'sqlite' or 'busy_timeout' not in settings.POLLS_SQLITE_PRAGMAS:
+            self.skipTest('SQLite tuning is off.')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.POLLS_SQLITE_PRAGMAS['busy_timeout'])
@@ -0,0 +1,207 @@
+"""Module for test the vote event log and the materialized tallies."""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.events import (HOUR, MINUTE, downsample_timeline, materialize_events, reset_materialized, results_at,
+                          roll_up_events)
+from polls.models import Choice, EventCheckpoint, EventTally, Question, VoteBucket, VoteEvent
+from polls.queue import enqueue_vote, flush_vote_queue
+from polls.voting import cast_vote, recount_votes
+from .test_detail import create_question
+
+
+@override_settings(POLLS_EVENTS={'BATCH_SIZE': 2})
+class VoteEventTests(TestCase):
+    """Test every vote write append an event and the materializer follow them."""
+
+    def setUp(self):
+        """Set up users, question and choices for testing."""
+        cache.clear()
+        self.users = [User.objects.create_user(username='user{}'.format(number)) for number in range(3)]
+        self.question = create_question(question_text='Event question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+
+    def materialized(self):
+        """Return the materialized votes of both choices."""
+        tallies = dict(EventTally.objects.values_list('choice_id', 'votes'))
+        return [tallies.get(self.first.pk, 0), tallies.get(self.second.pk, 0)]
+
+    def tallies(self):
+        """Return the live tallies of both choices."""
+        return list(Choice.objects.filter(question=self.question).with_tally().order_by('pk')
+                    .values_list('tally', flat=True))
+
+    def test_switch_keep_history(self):
+        """A switch append an event with the choice it left, a repeat append none."""
+        cast_vote(self.question, self.users[0], self.first)
+        cast_vote(self.question, self.users[0], self.second)
+        cast_vote(self.question, self.users[0], self.second)
+        events = list(VoteEvent.objects.order_by('pk').values_list('choice_id', 'previous_choice_id'))
+        self.assertEqual(events, [(self.first.pk, None), (self.second.pk, self.first.pk)])
+
+    def test_materialize_incremental(self):
+        """Only the events after the checkpoint are applied, in batches."""
+        for user in self.users:
+            cast_vote(self.question, user, self.first)
+        self.assertEqual(materialize_events(), 3)
+        self.assertEqual(self.materialized(), [3, 0])
+        cast_vote(self.question, self.users[0], self.second)
+        self.assertEqual(materialize_events(), 1)
+        self.assertEqual(self.materialized(), self.tallies())
+        self.assertEqual(EventCheckpoint.objects.get().position, VoteEvent.objects.order_by('-pk').first().pk)
+        self.assertEqual(materialize_events(), 0)
+
+    def test_late_commit(self):
+        """An event that commit below an applied id is applied by the next run."""
+        for user in self.users:
+            cast_vote(self.question, user, self.first)
+        late = VoteEvent.objects.order_by('pk')[1].pk
+        VoteEvent.objects.filter(pk=late).delete()
+        self.assertEqual(materialize_events(), 2)
+        self.assertEqual(EventCheckpoint.objects.get().gaps[0][:2], [late, late])
+        VoteEvent.objects.create(pk=late, question=self.question, choice=self.first, user=self.users[1])
+        self.assertEqual(materialize_events(), 1)
+        self.assertEqual(self.materialized(), [3, 0])
+        self.assertEqual(EventCheckpoint.objects.get().gaps, [])
+        self.assertEqual(materialize_events(), 0)
+
+    @override_settings(POLLS_EVENTS={'BATCH_SIZE': 10, 'GAP_TIMEOUT': 0})
+    def test_gap_timeout(self):
+        """A gap is forgotten after GAP_TIMEOUT, its event is then never applied."""
+        cast_vote(self.question, self.users[0], self.first)
+        cast_vote(self.question, self.users[1], self.first)
+        cast_vote(self.question, self.users[2], self.first)
+        VoteEvent.objects.order_by('pk')[1].delete()
+        self.assertEqual(materialize_events(), 2)
+        cast_vote(self.question, self.users[0], self.second)
+        self.assertEqual(materialize_events(), 1)
+        self.assertEqual(EventCheckpoint.objects.get().gaps, [])
+
+    def test_recount_check_materialized(self):
+        """Recount materialize the log and fix an EventTally that drifted from the votes."""
+        cast_vote(self.question, self.users[0], self.first)
+        cast_vote(self.question, self.users[1], self.second)
+        self.assertEqual(recount_votes(fix=False), [])
+        EventTally.objects.filter(choice=self.first).update(votes=5)
+        mismatches = recount_votes()
+        self.assertEqual([(tally.pk, stored, counted) for tally, stored, counted in mismatches],
+                         [(self.first.pk, 5, 1)])
+        self.assertEqual(self.materialized(), [1, 1])
+
+    def test_rebuild(self):
+        """A reset rebuild the same tallies from the first event."""
+        cast_vote(self.question, self.users[0], self.first)
+        cast_vote(self.question, self.users[1], self.second)
+        materialize_events()
+        reset_materialized()
+        self.assertEqual(self.materialized(), [0, 0])
+        materialize_events()
+        self.assertEqual(self.materialized(), [1, 1])
+
+    def test_results_at(self):
+        """The events give the results at a past time."""
+        cast_vote(self.question, self.users[0], self.first)
+        cast_vote(self.question, self.users[1], self.first)
+        before = timezone.now()
+        VoteEvent.objects.update(created_at=before - datetime.timedelta(minutes=1))
+        cast_vote(self.question, self.users[0], self.second)
+        self.assertEqual([result['votes'] for result in results_at(self.question, before)], [2, 0])
+        self.assertEqual([result['votes'] for result in results_at(self.question, timezone.now())], [1, 1])
+
+    def test_queue_flush_events(self):
+        """The queue flush append the events of its votes and switches."""
+        enqueue_vote(self.question, self.users[0], self.first)
+        flush_vote_queue()
+        enqueue_vote(self.question, self.users[0], self.second)
+        flush_vote_queue()
+        materialize_events()
+        self.assertEqual(VoteEvent.objects.count(), 2)
+        self.assertEqual(self.materialized(), [0, 1])
+
+
+@override_settings(POLLS_EVENTS={'BATCH_SIZE': 100})
+class VoteTimelineTests(TestCase):
+    """Test the events are rolled up in minute and hour buckets and read back from them."""
+
+    def setUp(self):
+        """Set up a question with votes and a switch at known times."""
+        cache.clear()
+        self.users = [User.objects.create_user(username='user{}'.format(number)) for number in range(3)]
+        self.question = create_question(question_text='Timeline question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.hour = datetime.datetime(2026, 10, 1, 12, tzinfo=datetime.timezone.utc)
+        times = [self.hour + datetime.timedelta(minutes=minutes) for minutes in (1, 1, 30, 65)]
+        cast_vote(self.question, self.users[0], self.first)
+        cast_vote(self.question, self.users[1], self.first)
+        cast_vote(self.question, self.users[2], self.second)
+        cast_vote(self.question, self.users[0], self.second)
+        for event, time in zip(VoteEvent.objects.order_by('pk'), times):
+            VoteEvent.objects.filter(pk=event.pk).update(created_at=time)
+
+    def buckets(self, size):
+        """Return the (start, choice text, votes) of the buckets of size."""
+        return list(VoteBucket.objects.filter(size=size).order_by('start', 'choice_id')
+                    .values_list('start', 'choice__choice_text', 'votes'))
+
+    def test_roll_up(self):
+        """Each event land in its minute and hour, a switch move one vote between choices."""
+        self.assertEqual(roll_up_events(), 4)
+        minute = datetime.timedelta(minutes=1)
+        self.assertEqual(self.buckets(MINUTE), [
+            (self.hour + minute, 'First', 2),
+            (self.hour + 30 * minute, 'Second', 1),
+            (self.hour + 65 * minute, 'First', -1),
+            (self.hour + 65 * minute, 'Second', 1),
+        ])
+        self.assertEqual(self.buckets(HOUR), [
+            (self.hour, 'First', 2),
+            (self.hour, 'Second', 1),
+            (self.hour + 60 * minute, 'First', -1),
+            (self.hour + 60 * minute, 'Second', 1),
+        ])
+        self.assertEqual(roll_up_events(), 0)
+
+    def test_downsample(self):
+        """The minute buckets of closed polls are dropped, the hours stay."""
+        roll_up_events()
+        self.assertEqual(downsample_timeline(), 0)
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(downsample_timeline(), 4)
+        self.assertEqual(len(self.buckets(HOUR)), 4)
+
+    def test_timeline_view(self):
+        """The timeline view read only the question window and the buckets, whatever the number of votes."""
+        roll_up_events()
+        url = reverse('polls:api_timeline', args=(self.question.id,))
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual([bucket['votes'] for bucket in data['buckets']], [
+            {str(self.first.pk): 2, str(self.second.pk): 1},
+            {str(self.first.pk): -1, str(self.second.pk): 1},
+        ])
+        self.assertEqual(self.client.get(url, {'resolution': 'second'}).status_code, 400)
+
+    def test_timeline_etag(self):
+        """The timeline is answered with a 304 until its buckets are rolled up again."""
+        url = reverse('polls:api_timeline', args=(self.question.id,))
+        response = self.client.get(url)
+        self.assertEqual(response.json()['buckets'], [])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            roll_up_events()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(len(response.json()['buckets']), 2)
+
+    def test_timeline_closed_headers(self):
+        """The timeline of a final poll can be kept by browsers and shared caches."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(days=1))
+        response = self.client.get(reverse('polls:api_timeline', args=(self.question.id,)))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
@@ -0,0 +1,97 @@
+"""Module for test the cached question list and the anonymous index page."""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from polls.caching import single_flight
+from .test_detail import create_question
+
+
+class IndexCacheTests(TestCase):
+    """Test the question list is shared by users and the greeting is not."""
+
+    def setUp(self):
+        """Set up a question and two users."""
+        cache.clear()
+        create_question(question_text='Cached question.', days=-1)
+        User.objects.create_user(username='Marry', password='secret')
+        User.objects.create_user(username='Tom', password='secret')
+
+    def test_list_shared_greeting_per_user(self):
+        """A cached list is reused by another user with their own greeting."""
+        self.client.login(username='Marry', password='secret')
+        self.assertContains(self.client.get(reverse('polls:index')), 'Hello, Marry')
+        self.client.login(username='Tom', password='secret')
+        # Session and user, the list come from the cache.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Hello, Tom')
+        self.assertContains(response, 'Cached question.')
+        self.assertEqual(response['Cache-Control'], 'private')
+
+    def test_new_question_show(self):
+        """Saving a question change the key of the cached list."""
+        self.client.get(reverse('polls:index'))
+        with self.captureOnCommitCallbacks(execute=True):
+            create_question(question_text='New question.', days=-1)
+        self.assertContains(self.client.get(reverse('polls:index')), 'New question.')
+
+    def test_anonymous_page(self):
+        """Anonymous users get the whole page from the cache with Vary: Cookie."""
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, 'Cached question.')
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_warm_command(self):
+        """After warming, the first request does not query the question list."""
+        stderr = StringIO()
+        call_command('warm_polls_cache', stdout=StringIO(), stderr=stderr)
+        self.assertIn('local to this process', stderr.getvalue())
+        self.client.login(username='Marry', password='secret')
+        with self.assertNumQueries(2):
+            self.client.get(reverse('polls:index'))
+
+
+    def test_warm_results_queries(self):
+        """Warming the results of an open question run one query for it, its results."""
+        create_question(question_text='Open question.', days=-0.01)
+        call_command('warm_polls_cache', stdout=StringIO(), stderr=StringIO())
+        cache.clear()
+        # The two question lists and their next transition, the questions, the results of each.
+        with self.assertNumQueries(6):
+            call_command('warm_polls_cache', stdout=StringIO(), stderr=StringIO())
+
+
+class SingleFlightTests(TestCase):
+    """Test only one request build a missing value."""
+
+    def setUp(self):
+        """Start from an empty cache."""
+        cache.clear()
+        self.builds = 0
+
+    def build(self):
+        """Count the builds."""
+        self.builds += 1
+        return 'value'
+
+    def test_build_once(self):
+        """The value is built on the first miss and reused."""
+        self.assertEqual(single_flight('polls:test', self.build, 60), 'value')
+        self.assertEqual(single_flight('polls:test', self.build, 60), 'value')
+        self.assertEqual(self.builds, 1)
+
+    def test_wait_for_lock(self):
+        """A locked key is waited for, and built without storing when the builder never finish."""
+        cache.add('polls:test:lock', True, 60)
+        self.assertEqual(single_flight('polls:test', self.build, 60, wait=0, attempts=3), 'value')
+        self.assertEqual(self.builds, 1)
+        self.assertIsNone(cache.get('polls:test'))
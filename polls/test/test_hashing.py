@@ -0,0 +1,51 @@
+"""Module for test the login hashing pool."""
+from unittest import mock
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.hashing import HashingBusy
+
+POOLED = {
+    'AUTHENTICATION_BACKENDS': ['polls.hashing.PooledModelBackend'],
+    'POLLS_HASHING': {'POOL_SIZE': 2, 'QUEUE': 2, 'TIMEOUT': 1},
+}
+
+
+@override_settings(**POOLED)
+class PooledBackendTests(TestCase):
+    """Test the pooled backend log in like ModelBackend."""
+
+    def setUp(self):
+        """Set up a user."""
+        cache.clear()
+        self.user = User.objects.create_user(username='Marry', password='secret')
+
+    def test_authenticate(self):
+        """Right password return the user, wrong password and unknown user return None."""
+        self.assertEqual(authenticate(username='Marry', password='secret'), self.user)
+        self.assertIsNone(authenticate(username='Marry', password='wrong'))
+        self.assertIsNone(authenticate(username='Nobody', password='secret'))
+
+    def test_upgrade_hash(self):
+        """A hash of another hasher is replaced with the preferred hasher on login."""
+        User.objects.filter(pk=self.user.pk).update(password=make_password('secret', hasher='pbkdf2_sha256'))
+        authenticate(username='Marry', password='secret')
+        self.assertFalse(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(authenticate(username='Marry', password='secret'), self.user)
+
+    def test_login_page_busy(self):
+        """Login answer 503 when the pool is full."""
+        with mock.patch('polls.hashing.run_hashing', side_effect=HashingBusy):
+            response = self.client.post(reverse('polls:login'), {'username': 'Marry', 'password': 'secret'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    def test_login_page(self):
+        """Login through the pool log the user in."""
+        response = self.client.post(reverse('polls:login'), {'username': 'Marry', 'password': 'secret'})
+        self.assertRedirects(response, reverse('polls:index'))
@@ -0,0 +1,78 @@
+"""Module for test the poll import and vote export commands."""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from polls.models import Question, Choice, Vote
+from .test_detail import create_question
+
+
+class ImportPollsCommandTests(TestCase):
+    """Test import_polls read CSV and JSONL files."""
+
+    def write(self, name, text):
+        """Write text to a temporary file and return its path."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def test_import_csv(self):
+        """CSV rows of the same question become one question with its choices."""
+        path = self.write('polls.csv', 'question_text,pub_date,end_date,choice_text\n'
+                                       'Best food?,2020-01-01T00:00:00,2020-02-01T00:00:00,Rice\n'
+                                       'Best food?,2020-01-01T00:00:00,2020-02-01T00:00:00,Noodle\n'
+                                       'Best drink?,2020-01-02T00:00:00,2020-02-01T00:00:00,Tea\n')
+        call_command('import_polls', path, '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(Question.objects.count(), 2)
+        food = Question.objects.get(question_text='Best food?')
+        self.assertEqual([choice.choice_text for choice in food.choice_set.order_by('pk')], ['Rice', 'Noodle'])
+
+    def test_import_jsonl(self):
+        """Each JSONL line become one question with its choices."""
+        line = {'question_text': 'Best food?', 'pub_date': '2020-01-01T00:00:00+07:00',
+                'end_date': '2020-02-01T00:00:00+07:00', 'choices': ['Rice', 'Noodle']}
+        path = self.write('polls.jsonl', json.dumps(line) + '\n')
+        call_command('import_polls', path, stdout=StringIO())
+        self.assertEqual(Choice.objects.filter(question__question_text='Best food?').count(), 2)
+
+    def test_import_invalid_date(self):
+        """Invalid date stop the import with an error."""
+        path = self.write('polls.jsonl', json.dumps({'question_text': 'Bad', 'pub_date': 'soon',
+                                                     'end_date': 'later'}) + '\n')
+        with self.assertRaises(CommandError):
+            call_command('import_polls', path, stdout=StringIO())
+
+
+class ExportVotesCommandTests(TestCase):
+    """Test export_votes write every vote."""
+
+    def setUp(self):
+        """Set up two votes on one question."""
+        question = create_question(question_text='Export question.', days=-1)
+        choice = question.choice_set.create(choice_text='First')
+        for name in ('Marry', 'Tom'):
+            Vote.objects.create(question=question, choice=choice, user=User.objects.create_user(username=name))
+
+    def test_export_csv(self):
+        """CSV export has a header and one row per vote."""
+        out = StringIO()
+        call_command('export_votes', '--chunk-size', '1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,question_id,choice_id,user_id,username')
+        self.assertEqual(len(lines), 3)
+
+    def test_export_jsonl(self):
+        """JSONL export has one object per vote."""
+        out = StringIO()
+        call_command('export_votes', '--format', 'jsonl', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['username'] for row in rows], ['Marry', 'Tom'])
@@ -2,7 +2,8 @@
 
 import datetime
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.urls import reverse
 
@@ -12,19 +13,23 @@ from .test_detail import create_question
 class QuestionIndexViewTests(TestCase):
     """Test the Question index page."""
 
+    def setUp(self):
+        """Start from an empty cache, the index is cached."""
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_question_list'], [])
+        self.assertQuerySetEqual(response.context['latest_question_list'], [])
 
     def test_past_question(self):
         """pub_date in the past question are displayed on the index page."""
         create_question(question_text="Past question.", days=-30)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
-            response.context['latest_question_list'], ['<Question: Past question.>']
+        self.assertQuerySetEqual(
+            response.context['latest_question_list'], ['<Question: Past question.>'], transform=repr
         )
 
     def test_future_question(self):
@@ -32,16 +37,16 @@ class QuestionIndexViewTests(TestCase):
         create_question(question_text="Future question.", days=30)
         response = self.client.get(reverse('polls:index'))
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_question_list'], [])
+        self.assertQuerySetEqual(response.context['latest_question_list'], [])
 
     def test_future_question_and_past_question(self):
         """Only past questions are displayed."""
         create_question(question_text="Past question.", days=-30)
         create_question(question_text="Future question.", days=30)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question.>']
+            ['<Question: Past question.>'], transform=repr
         )
 
     def test_two_past_questions(self):
@@ -49,7 +54,59 @@ class QuestionIndexViewTests(TestCase):
         create_question(question_text="Past question 1.", days=-30)
         create_question(question_text="Past question 2.", days=-5)
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_question_list'],
-            ['<Question: Past question 2.>', '<Question: Past question 1.>']
+            ['<Question: Past question 2.>', '<Question: Past question 1.>'], transform=repr
+        )
+
+    def test_open_polls_only(self):
+        """open=1 hide the questions that can no longer be voted."""
+        create_question(question_text="Open question.", days=-5)
+        closed = create_question(question_text="Closed question.", days=-5)
+        closed.end_date = timezone.now() - datetime.timedelta(days=1)
+        closed.save()
+        response = self.client.get(reverse('polls:index'), {'open': '1'})
+        self.assertQuerySetEqual(
+            response.context['latest_question_list'], ['<Question: Open question.>'], transform=repr
         )
+
+
+@override_settings(POLLS_INDEX_PAGE_SIZE=2)
+class QuestionIndexPaginationTests(TestCase):
+    """Test the keyset pagination of the index page."""
+
+    def setUp(self):
+        """Start from an empty cache, the index is cached."""
+        cache.clear()
+
+    def test_pages(self):
+        """Every question is on exactly one page, newest first."""
+        for day in range(5):
+            create_question(question_text="Question {}.".format(day), days=-day - 1)
+        create_question(question_text="Same time.", days=-1)
+        texts = []
+        cursor = None
+        while True:
+            response = self.client.get(reverse('polls:index'), {'after': cursor} if cursor else {})
+            self.assertLessEqual(len(response.context['latest_question_list']), 2)
+            texts += [question.question_text for question in response.context['latest_question_list']]
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(texts, ['Same time.', 'Question 0.', 'Question 1.', 'Question 2.',
+                                 'Question 3.', 'Question 4.'])
+
+    def test_page_queries(self):
+        """A deep page cost the same number of queries as the first page."""
+        for day in range(10):
+            create_question(question_text="Question {}.".format(day), days=-day - 1)
+        response = self.client.get(reverse('polls:index'))
+        cursor = response.context['next_cursor']
+        with self.assertNumQueries(1):
+            self.client.get(reverse('polls:index'), {'after': cursor})
+
+    def test_invalid_cursor(self):
+        """Invalid cursor show the first page."""
+        create_question(question_text="Past question.", days=-1)
+        response = self.client.get(reverse('polls:index'), {'after': 'nonsense'})
+        self.assertEqual(len(response.context['latest_question_list']), 1)
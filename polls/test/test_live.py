@@ -0,0 +1,151 @@
+"""Module for test the live results over Server-Sent Events."""
+import asyncio
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.caching import get_results
+from polls.live import InMemoryBroker
+from polls.voting import cast_vote
+from .test_detail import create_question
+
+
+class InMemoryBrokerTests(TestCase):
+    """Test the broker merge the deltas of one tick."""
+
+    async def test_merge_deltas_of_one_tick(self):
+        """Many votes in one tick arrive as one merged delta."""
+        broker = InMemoryBroker(tick=0.01)
+        subscription = broker.subscribe(1)
+        for _ in range(100):
+            broker.publish(1, {10: 1})
+        broker.publish(1, {10: -1, 11: 1})
+        broker.publish(2, {20: 1})
+        self.assertEqual(await subscription.get(timeout=1), {10: 99, 11: 1})
+        self.assertIsNone(await subscription.get(timeout=0.05))
+        subscription.close()
+        self.assertEqual(broker.subscribers, {})
+
+    def test_loops_in_other_threads(self):
+        """Clients waiting in event loops of other threads are woken by the ticker thread."""
+        broker = InMemoryBroker(tick=0.01)
+        received = []
+
+        async def client():
+            subscription = broker.subscribe(1)
+            received.append(await subscription.get(timeout=1))
+            subscription.close()
+
+        threads = [threading.Thread(target=asyncio.run, args=(client(),)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while len(broker.subscribers.get(1, ())) < 2:
+            time.sleep(0.001)
+        broker.publish(1, {10: 1})
+        for thread in threads:
+            thread.join()
+        self.assertEqual(received, [{10: 1}, {10: 1}])
+
+    def test_publish_without_subscribers(self):
+        """Deltas of a question nobody watch are dropped."""
+        broker = InMemoryBroker(tick=0.01)
+        broker.publish(1, {10: 1})
+        self.assertEqual(broker.changed, set())
+
+    async def test_late_subscriber(self):
+        """A vote published before a client subscribed is not sent to it."""
+        broker = InMemoryBroker(tick=0.01)
+        first = broker.subscribe(1)
+        first.set_since(0)
+        broker.publish(1, {10: 1}, 1)
+        second = broker.subscribe(1)
+        second.set_since(1)
+        broker.publish(1, {11: 1}, 2)
+        self.assertEqual(await first.get(timeout=1), {10: 1, 11: 1})
+        self.assertEqual(await second.get(timeout=1), {11: 1})
+        self.assertEqual(second.version, 2)
+        first.close()
+        second.close()
+
+    async def test_drop_deltas_in_snapshot(self):
+        """Votes published before the snapshot version is known are dropped up to it."""
+        broker = InMemoryBroker(tick=0.01)
+        subscription = broker.subscribe(1)
+        broker.publish(1, {10: 1}, 3)
+        broker.publish(1, {10: 1}, 4)
+        subscription.set_since(3)
+        self.assertEqual(await subscription.get(timeout=1), {10: 1})
+        self.assertEqual(subscription.version, 4)
+        subscription.close()
+
+
+@override_settings(POLLS_LIVE={'ENABLED': True, 'TICK': 0.01, 'KEEPALIVE': 1.0})
+class ResultsStreamTests(TestCase):
+    """Test the live results endpoint."""
+
+    def setUp(self):
+        """Set up a question with choices."""
+        cache.clear()
+        self.user = User.objects.create_user(username='Marry', password='secret')
+        self.question = create_question(question_text='Live question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.url = reverse('polls:results_stream', args=(self.question.id,))
+
+    async def test_snapshot_then_delta(self):
+        """Stream start with the snapshot and push the vote as a delta."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        snapshot = (await anext(events)).decode()
+        self.assertTrue(snapshot.startswith('event: snapshot'))
+        snapshot_id = int(snapshot.split('id: ')[1].split('\n')[0])
+
+        def vote():
+            with self.captureOnCommitCallbacks(execute=True):
+                cast_vote(self.question, self.user, self.first)
+        await sync_to_async(vote)()
+
+        delta = (await asyncio.wait_for(anext(events), 1)).decode()
+        self.assertTrue(delta.startswith('event: delta'))
+        self.assertGreater(int(delta.split('id: ')[1].split('\n')[0]), snapshot_id)
+        self.assertEqual(json.loads(delta.split('data: ')[1]), {str(self.first.id): 1})
+        await events.aclose()
+
+    @override_settings(POLLS_RESULTS_CACHE_MODE='ttl')
+    async def test_ttl_snapshot_read_fresh(self):
+        """In ttl mode the snapshot is read from the database, not from the cached results."""
+        await sync_to_async(get_results)(self.question)
+        await sync_to_async(cast_vote)(self.question, self.user, self.first)
+        response = await self.async_client.get(self.url)
+        events = aiter(response.streaming_content)
+        snapshot = (await anext(events)).decode()
+        self.assertEqual(json.loads(snapshot.split('data: ')[1])[0]['votes'], 1)
+        await events.aclose()
+
+    def test_not_served_under_wsgi(self):
+        """Under WSGI the stream answer 204 at once instead of blocking the worker."""
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+
+    @override_settings(POLLS_LIVE={'TICK': 0.01, 'KEEPALIVE': 1.0})
+    async def test_disabled(self):
+        """With live results off the stream answer 204 and the page do not open it."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 204)
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertNotContains(response, 'EventSource')
+
+    async def test_results_page_open_stream(self):
+        """With live results on the page of an open poll open the stream."""
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, 'EventSource')
+
+    async def test_missing_question(self):
+        """Unknown question is not found."""
+        response = await self.async_client.get(reverse('polls:results_stream', args=(999,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,59 @@
+"""Module for test the request metrics middleware."""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .test_detail import create_question
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    """Test the numbers reported for each request."""
+
+    def setUp(self):
+        """Set up a question with a choice."""
+        cache.clear()
+        self.question = create_question(question_text='Metrics question.', days=-1)
+        self.question.choice_set.create(choice_text='First')
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_server_timing(self):
+        """Response tell the queries and the cache miss then the cache hit."""
+        response = self.client.get(self.url)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('"2 queries"', response['Server-Timing'])
+        self.assertIn('"0 hits 1 misses"', response['Server-Timing'])
+        response = self.client.get(self.url)
+        self.assertIn('"1 queries"', response['Server-Timing'])
+        self.assertIn('"1 hits 0 misses"', response['Server-Timing'])
+
+    def test_page_and_fragment_cache(self):
+        """The cached anonymous page and the single flight fragments are counted."""
+        url = reverse('polls:index')
+        self.assertIn('"0 hits 2 misses"', self.client.get(url)['Server-Timing'])
+        self.assertIn('"1 hits 0 misses"', self.client.get(url)['Server-Timing'])
+
+    def test_log_line(self):
+        """Every request log one structured line."""
+        with self.assertLogs('polls.metrics', level='INFO') as logs:
+            self.client.get(self.url)
+        self.assertIn('"queries": 2', logs.output[0])
+        self.assertIn('"status": 200', logs.output[0])
+
+    @override_settings(POLLS_METRICS={'SLOW_REQUEST_MS': 0, 'SLOW_SAMPLE_RATE': 1.0})
+    def test_slow_request_log_sql(self):
+        """Sampled slow request log the SQL text of its queries."""
+        with self.assertLogs('polls.metrics.slow', level='WARNING') as logs:
+            self.client.get(self.url)
+        self.assertIn('polls_question', logs.output[0])
+
+    @override_settings(POLLS_METRICS={'SERVER_TIMING': False})
+    def test_server_timing_off(self):
+        """SERVER_TIMING False leave out the header."""
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    async def test_async_request(self):
+        """Requests served by the ASGI handler are measured too."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
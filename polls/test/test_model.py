@@ -59,3 +59,31 @@ class QuestionModelTests(TestCase):
         time = timezone.now() + datetime.timedelta(days=-2)
         recent_question = Question(pub_date=time, end_date=time + datetime.timedelta(days=-1))
         self.assertIs(recent_question.can_vote(), False)
+
+
+class QuestionQuerySetTests(TestCase):
+    """Test the time window filters agree with the question methods."""
+
+    def setUp(self):
+        """Set up questions before, during and after their vote period."""
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        self.future = Question.objects.create(question_text='Future', pub_date=now + day, end_date=now + 2 * day)
+        self.recent = Question.objects.create(question_text='Recent', pub_date=now - day / 2, end_date=now + day)
+        self.old = Question.objects.create(question_text='Old', pub_date=now - 5 * day, end_date=now + day)
+        self.closed = Question.objects.create(question_text='Closed', pub_date=now - 5 * day, end_date=now - day)
+
+    def test_filters_match_methods(self):
+        """published, open and recent keep the same questions as the methods."""
+        questions = Question.objects.all()
+        for name, method in (('published', 'is_published'), ('open', 'can_vote'),
+                             ('recent', 'was_published_recently')):
+            with self.subTest(name):
+                expected = {question.pk for question in questions if getattr(question, method)()}
+                self.assertEqual(set(getattr(Question.objects, name)().values_list('pk', flat=True)), expected)
+
+    def test_next_transition(self):
+        """Next transition is the nearest future pub_date or end_date."""
+        self.assertEqual(Question.objects.next_transition(), self.future.pub_date)
+        self.future.delete()
+        self.assertEqual(Question.objects.next_transition(), self.recent.end_date)
@@ -0,0 +1,45 @@
+"""Module for test the number of queries of the detail and results pages."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .test_detail import create_question
+
+
+class QueryCountMixin:
+    """Helper for lock in the number of queries of a page."""
+
+    def assertQueriesFlat(self, url_name, num, choices=(1, 10)):
+        """Check that the page run num queries whatever number of choices the question has.
+
+        Args:
+            url_name: name of the page that take the question id.
+            num: number of queries the page may run.
+            choices: numbers of choices to try.
+        """
+        for count in choices:
+            question = create_question(question_text='Question with {} choices.'.format(count), days=-1)
+            for number in range(count):
+                question.choice_set.create(choice_text='Choice {}'.format(number))
+            cache.clear()
+            with self.subTest(choices=count), self.assertNumQueries(num):
+                response = self.client.get(reverse(url_name, args=(question.id,)))
+            self.assertEqual(response.status_code, 200)
+
+
+class PageQueryTests(QueryCountMixin, TestCase):
+    """Test the detail and results pages run a fixed number of queries."""
+
+    def setUp(self):
+        """Log in for the detail page, which load the session and the user in two queries."""
+        User.objects.create_user(username='Marry', password='secret')
+        self.client.login(username='Marry', password='secret')
+
+    def test_detail_queries(self):
+        """Detail page load the question and all its choices in two queries."""
+        self.assertQueriesFlat('polls:detail', 2 + 2)
+
+    def test_results_queries(self):
+        """Results page load the question and the choices with their votes in two queries."""
+        self.assertQueriesFlat('polls:results', 2)
@@ -0,0 +1,85 @@
+"""Module for test the write-behind vote queue."""
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.models import Question, Choice, Vote, PendingVote
+from polls.queue import enqueue_vote, flush_vote_queue
+from .test_detail import create_question
+
+
+class VoteQueueTests(TestCase):
+    """Test queued votes are written in batches with correct tallies."""
+
+    def setUp(self):
+        """Set up users, question and choices for testing."""
+        cache.clear()
+        self.marry = User.objects.create_user(username='Marry', password='secret')
+        self.tom = User.objects.create_user(username='Tom', password='secret')
+        self.question = create_question(question_text='Queue question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+
+    def assertTallies(self, total, first, second):
+        """Check the stored tallies of the question and both choices."""
+        self.assertEqual(Question.objects.get(pk=self.question.pk).total_votes, total)
+        self.assertEqual(Choice.objects.get(pk=self.first.pk).votes, first)
+        self.assertEqual(Choice.objects.get(pk=self.second.pk).votes, second)
+
+    @override_settings(POLLS_VOTE_INGESTION='queue')
+    def test_view_queue_vote(self):
+        """In queue mode the vote page only queue the vote."""
+        self.client.login(username='Marry', password='secret')
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.first.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(PendingVote.objects.count(), 1)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_flush_write_votes(self):
+        """Flush write one vote per user and the tallies."""
+        enqueue_vote(self.question, self.marry, self.first)
+        enqueue_vote(self.question, self.tom, self.first)
+        self.assertEqual(flush_vote_queue(), 2)
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertFalse(PendingVote.objects.exists())
+        self.assertTallies(2, 2, 0)
+
+    def test_last_write_wins(self):
+        """Last queued vote of a user is the one that count."""
+        enqueue_vote(self.question, self.marry, self.first)
+        enqueue_vote(self.question, self.marry, self.second)
+        flush_vote_queue()
+        self.assertEqual(Vote.objects.get(user=self.marry).choice, self.second)
+        self.assertTallies(1, 0, 1)
+        enqueue_vote(self.question, self.marry, self.first)
+        flush_vote_queue()
+        self.assertEqual(Vote.objects.get(user=self.marry).choice, self.first)
+        self.assertTallies(1, 1, 0)
+
+    @override_settings(POLLS_VOTE_QUEUE={'LAST_WRITE_WINS': False})
+    def test_first_write_wins(self):
+        """Without LAST_WRITE_WINS the first vote of a user is kept."""
+        enqueue_vote(self.question, self.marry, self.first)
+        enqueue_vote(self.question, self.marry, self.second)
+        flush_vote_queue()
+        self.assertEqual(Vote.objects.get(user=self.marry).choice, self.first)
+        self.assertTallies(1, 1, 0)
+
+    def test_batch_size(self):
+        """Flush take at most batch_size queued votes."""
+        enqueue_vote(self.question, self.marry, self.first)
+        enqueue_vote(self.question, self.tom, self.second)
+        self.assertEqual(flush_vote_queue(batch_size=1), 1)
+        self.assertEqual(PendingVote.objects.count(), 1)
+
+    def test_command_drain_queue(self):
+        """process_vote_queue --once write every queued vote."""
+        enqueue_vote(self.question, self.marry, self.first)
+        enqueue_vote(self.question, self.tom, self.second)
+        call_command('process_vote_queue', '--once', '--batch-size', '1', stdout=StringIO())
+        self.assertFalse(PendingVote.objects.exists())
+        self.assertTallies(2, 1, 1)
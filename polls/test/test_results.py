@@ -0,0 +1,157 @@
+"""Module for test the cached results page and the results export."""
+import datetime
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.caching import catalog_state, get_results, transition_timeout
+from .test_detail import create_question
+
+
+class ResultsCacheTests(TestCase):
+    """Test the results are cached and invalidated by votes."""
+
+    def setUp(self):
+        """Set up user, question and choices for testing."""
+        cache.clear()
+        User.objects.create_user(username='Marry', password='secret')
+        self.client.login(username='Marry', password='secret')
+        self.question = create_question(question_text='Results question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def vote(self, choice):
+        """Post the vote for choice and run the on commit invalidation."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def votes(self):
+        """Return the votes of each choice from the results page."""
+        response = self.client.get(self.url)
+        return [choice['votes'] for choice in response.context['results']]
+
+    def test_results_from_cache(self):
+        """Second look at the results does not query the choices again."""
+        get_results(self.question)
+        with self.assertNumQueries(0):
+            results = get_results(self.question)
+        self.assertEqual([choice['choice_text'] for choice in results], ['First', 'Second'])
+
+    def test_vote_invalidate_results(self):
+        """Results show the new vote right after voting."""
+        self.assertEqual(self.votes(), [0, 0])
+        self.vote(self.first)
+        self.assertEqual(self.votes(), [1, 0])
+        self.vote(self.second)
+        self.assertEqual(self.votes(), [0, 1])
+
+    def test_new_choice_invalidate_results(self):
+        """Results show a choice that was added after they were cached."""
+        self.votes()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.choice_set.create(choice_text='Third')
+        self.assertEqual(len(self.votes()), 3)
+
+    @override_settings(POLLS_RESULTS_CACHE_MODE='ttl')
+    def test_ttl_mode_keep_results(self):
+        """In ttl mode votes do not invalidate the cached results."""
+        self.assertEqual(self.votes(), [0, 0])
+        self.vote(self.first)
+        self.assertEqual(self.votes(), [0, 0])
+        cache.clear()
+        self.assertEqual(self.votes(), [1, 0])
+
+
+class ResultsExportTests(TestCase):
+    """Test the streaming results export."""
+
+    def setUp(self):
+        """Set up a question with a vote."""
+        cache.clear()
+        self.user = User.objects.create_user(username='Marry', password='secret')
+        self.client.login(username='Marry', password='secret')
+        self.question = create_question(question_text='Export question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.question.choice_set.create(choice_text='Second')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.first.id})
+        self.url = reverse('polls:results_export', args=(self.question.id,))
+
+    def content(self, response):
+        """Return the streamed content as text."""
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_tallies(self):
+        """CSV export has one row per choice with its votes."""
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = self.content(response).splitlines()
+        self.assertEqual(lines, ['choice_id,choice_text,votes', '{},First,1'.format(self.first.id),
+                                 '{},Second,0'.format(self.first.id + 1)])
+
+    def test_ndjson_tallies(self):
+        """NDJSON export has one object per choice."""
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['votes'] for row in rows], [1, 0])
+
+    def test_not_modified(self):
+        """Same ETag answer 304 until a vote change the results."""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.first.id + 1})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_votes_staff_only(self):
+        """Only staff can export the raw votes."""
+        response = self.client.get(self.url, {'data': 'votes'})
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(self.url, {'data': 'votes', 'format': 'ndjson'})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(rows[0]['user_id'], self.user.id)
+        self.assertIsNotNone(rows[0]['cast_at'])
+
+    def test_bad_format(self):
+        """Unknown format is a bad request."""
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogStateTests(TestCase):
+    """Test the question list cache key change at the poll boundaries."""
+
+    def setUp(self):
+        """Set up a question that close soon."""
+        cache.clear()
+        self.question = create_question(question_text='Closing question.', days=-1)
+        self.question.end_date = timezone.now() + datetime.timedelta(seconds=30)
+        self.question.save()
+
+    def test_state_change_when_poll_close(self):
+        """State change exactly when the end date pass."""
+        state = catalog_state()
+        self.assertEqual(catalog_state(), state)
+        self.assertLessEqual(transition_timeout(300), 30)
+        later = self.question.end_date + datetime.timedelta(microseconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertNotEqual(catalog_state(), state)
+
+    def test_state_change_when_question_saved(self):
+        """State change when a question is edited."""
+        state = catalog_state()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_question(question_text='New question.', days=-1)
+        self.assertNotEqual(catalog_state(), state)
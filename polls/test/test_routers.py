@@ -0,0 +1,70 @@
+"""Module for test the read replica routing."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.models import Question, Vote
+from polls.routers import STICKY_COOKIE, ReadState, ReplicaRouter, activate, deactivate
+from .test_detail import create_question
+
+
+@override_settings(POLLS_REPLICAS=['replica'], DATABASE_ROUTERS=['polls.routers.ReplicaRouter'],
+                   POLLS_THROTTLE={'ENABLED': False})
+class ReplicaRouterTests(TestCase):
+    """Test the poll reads go to the replica unless the client just voted.
+
+    The replica is a second SQLite database holding the same question with
+    another text, so the page show which database it was read from.
+    """
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        """Set up the question on both databases and a logged in user."""
+        cache.clear()
+        self.question = create_question(question_text='Primary question.', days=-1)
+        self.choice = self.question.choice_set.create(choice_text='First')
+        replica = Question.objects.using('replica')
+        replica.create(pk=self.question.pk, question_text='Replica question.', pub_date=self.question.pub_date,
+                       end_date=self.question.end_date)
+        User.objects.create_user(username='Marry', password='secret')
+        self.client.login(username='Marry', password='secret')
+
+    def detail(self):
+        """Return the vote page of the question."""
+        return self.client.get(reverse('polls:detail', args=(self.question.id,)))
+
+    def test_reads_go_to_replica(self):
+        """Poll reads of a request use the replica until it write, users use the primary."""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Question), 'default')
+        token = activate(ReadState())
+        try:
+            self.assertEqual(router.db_for_read(Question), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Question), 'default')
+            self.assertEqual(router.db_for_read(Question), 'default')
+        finally:
+            deactivate(token)
+        self.assertContains(self.detail(), 'Replica question.')
+
+    def test_read_your_vote(self):
+        """After a vote the client read from the primary until the cookie expire."""
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        self.assertEqual(Vote.objects.using('default').count(), 1)
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+        self.assertContains(self.detail(), 'Primary question.')
+        self.client.cookies.pop(STICKY_COOKIE)
+        self.assertContains(self.detail(), 'Replica question.')
+
+    def test_index_list(self):
+        """The cached index list is read from the primary, the uncached one from the replica."""
+        self.assertContains(self.client.get(reverse('polls:index')), 'Primary question.')
+        with self.settings(POLLS_INDEX_CACHE_TIMEOUT=0):
+            self.assertContains(self.client.get(reverse('polls:index')), 'Replica question.')
+
+    def test_versioned_results_read_primary(self):
+        """Results cached under a version are read from the primary."""
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual([choice['choice_text'] for choice in response.context['results']], ['First'])
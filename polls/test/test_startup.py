@@ -0,0 +1,66 @@
+"""Module for test the lean URLconf of the vote workers, the logging setup and the system checks."""
+import logging
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from polls.checks import check_shared_cache
+from polls.models import Vote
+from .test_detail import create_question
+
+
+@override_settings(ROOT_URLCONF='mysite.urls_lean', POLLS_THROTTLE={'ENABLED': False})
+class LeanUrlsTests(TestCase):
+    """Test the lean URLconf serve the poll pages without the admin site."""
+
+    def setUp(self):
+        """Set up a question and a logged in user."""
+        cache.clear()
+        self.question = create_question(question_text='Lean question.', days=-1)
+        self.choice = self.question.choice_set.create(choice_text='First')
+        User.objects.create_user(username='Marry', password='secret')
+        self.client.login(username='Marry', password='secret')
+
+    def test_poll_pages(self):
+        """The index, the vote and the registration page work the same."""
+        self.assertContains(self.client.get(reverse('polls:index')), 'Lean question.')
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(self.client.get(reverse('polls:registration')).status_code, 200)
+
+    def test_no_admin(self):
+        """The admin site is not routed."""
+        self.assertEqual(self.client.get('/admin/').status_code, 404)
+
+
+class LoggingTests(TestCase):
+    """Test the poll loggers are configured once from LOGGING."""
+
+    def test_one_handler(self):
+        """The module loggers have no handler of their own, they go through 'polls'."""
+        self.assertEqual(len(logging.getLogger('polls').handlers), 1)
+        self.assertEqual(logging.getLogger('polls.views').handlers, [])
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Test the system check of the default cache."""
+
+    locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    @override_settings(DEBUG=False, CACHES=locmem)
+    def test_locmem_without_debug(self):
+        """A process-local cache outside DEBUG is reported."""
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['polls.W001'])
+
+    @override_settings(DEBUG=True, CACHES=locmem)
+    def test_locmem_with_debug(self):
+        """A process-local cache is fine while developing."""
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(DEBUG=False, CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_shared_cache(self):
+        """A shared cache is not reported."""
+        self.assertEqual(check_shared_cache(None), [])
@@ -0,0 +1,124 @@
+"""Module for test the rate limits and the duplicate vote suppression."""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.models import Question, Vote
+from polls.throttling import _take
+from .test_detail import create_question
+
+THROTTLE = {'RATES': {'vote_user': '3/min', 'vote_ip': '100/min', 'login_user': '2/min', 'login_ip': '100/min'}}
+
+
+class TokenBucketTests(TestCase):
+    """Test the token bucket arithmetic."""
+
+    def test_bucket_refill(self):
+        """A full bucket give capacity tokens, then one token every period / capacity."""
+        state = None
+        for _ in range(2):
+            state, wait = _take(state, (2, 60), 1000)
+            self.assertEqual(wait, 0)
+        state, wait = _take(state, (2, 60), 1000)
+        self.assertEqual(wait, 30)
+        state, wait = _take(state, (2, 60), 1030)
+        self.assertEqual(wait, 0)
+
+
+@override_settings(POLLS_THROTTLE=THROTTLE)
+class VoteThrottleTests(TestCase):
+    """Test the limits and the dedupe on the vote view."""
+
+    def setUp(self):
+        """Set up a logged in user and an open question."""
+        cache.clear()
+        User.objects.create_user(username='Marry', password='secret')
+        self.client.login(username='Marry', password='secret')
+        self.question = create_question(question_text='Throttled question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+
+    def vote(self, choice, **headers):
+        """Post the vote for choice."""
+        return self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id},
+                                headers=headers)
+
+    def test_duplicate_vote_skip_queries(self):
+        """Posting the same choice again redirect without reading the question."""
+        self.vote(self.first)
+        with self.assertNumQueries(2):
+            response = self.vote(self.first)
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(Question.objects.get(pk=self.question.pk).total_votes, 1)
+
+    def test_switch_back_is_not_duplicate(self):
+        """Only a repeat of the last submission is suppressed."""
+        self.vote(self.first)
+        self.vote(self.second)
+        self.vote(self.first)
+        self.assertEqual(Vote.objects.get().choice, self.first)
+
+    def test_idempotency_key(self):
+        """A seen Idempotency-Key suppress the submission even for another choice."""
+        self.vote(self.first, idempotency_key='abc')
+        self.vote(self.second, idempotency_key='abc')
+        self.assertEqual(Vote.objects.get().choice, self.first)
+
+    def test_refused_vote_is_forgotten(self):
+        """A vote without a choice can be corrected and posted again."""
+        self.client.post(reverse('polls:vote', args=(self.question.id,)))
+        self.vote(self.first)
+        self.assertEqual(Vote.objects.get().choice, self.first)
+
+    def test_failed_write_is_forgotten(self):
+        """A vote whose write failed is not taken for a repeat when posted again."""
+        with mock.patch('polls.views.cast_vote', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                self.vote(self.first)
+        self.vote(self.first)
+        self.assertEqual(Vote.objects.get().choice, self.first)
+
+    def test_user_limit(self):
+        """The fourth vote in a minute is refused with Retry-After."""
+        for choice in (self.first, self.second, self.first):
+            self.assertEqual(self.vote(choice).status_code, 302)
+        response = self.vote(self.second)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+    @override_settings(POLLS_THROTTLE={**THROTTLE, 'ENABLED': False})
+    def test_disabled(self):
+        """No limit and no dedupe when the throttle is off."""
+        for choice in (self.first, self.second, self.first, self.second, self.second):
+            self.assertEqual(self.vote(choice).status_code, 302)
+
+
+@override_settings(POLLS_THROTTLE=THROTTLE)
+class LoginThrottleTests(TestCase):
+    """Test the limits on the login page."""
+
+    def setUp(self):
+        """Set up a user."""
+        cache.clear()
+        User.objects.create_user(username='Marry', password='secret')
+
+    def test_login_limit_per_username(self):
+        """Guessing the password of one username is limited, other usernames are not."""
+        url = reverse('polls:login')
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {'username': 'Marry', 'password': 'x'}).status_code, 200)
+        self.assertEqual(self.client.post(url, {'username': 'marry', 'password': 'x'}).status_code, 429)
+        self.assertEqual(self.client.post(url, {'username': 'John', 'password': 'x'}).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_login_limit_per_client(self):
+        """Failing the logins of a username from one address does not lock it out elsewhere."""
+        url = reverse('polls:login')
+        for _ in range(3):
+            self.client.post(url, {'username': 'Marry', 'password': 'x'}, REMOTE_ADDR='10.0.0.1')
+        response = self.client.post(url, {'username': 'Marry', 'password': 'secret'}, REMOTE_ADDR='10.0.0.2')
+        self.assertRedirects(response, reverse('polls:index'))
@@ -0,0 +1,149 @@
+"""Module for test the vote and the vote tallies."""
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.models import Question, Choice, Vote
+from polls.voting import cast_vote
+from .test_detail import create_question
+
+
+class VoteTallyTests(TestCase):
+    """Test the vote tallies of question and choice."""
+
+    def setUp(self):
+        """Set up user, question and choices for testing."""
+        cache.clear()
+        self.user = User.objects.create_user(username='Marry', password='secret')
+        self.client.login(username='Marry', password='secret')
+        self.question = create_question(question_text='Vote question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+
+    def vote(self, choice):
+        """Post the vote for choice."""
+        return self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def assertTallies(self, total, first, second):
+        """Check the stored tallies of the question and both choices."""
+        self.assertEqual(Question.objects.get(pk=self.question.pk).total_votes, total)
+        self.assertEqual(Choice.objects.get(pk=self.first.pk).votes, first)
+        self.assertEqual(Choice.objects.get(pk=self.second.pk).votes, second)
+
+    def test_vote_count_tally(self):
+        """First vote of user add one to question and choice."""
+        response = self.vote(self.first)
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertTallies(1, 1, 0)
+
+    def test_same_vote_twice(self):
+        """Voting the same choice again does not change the tallies."""
+        self.vote(self.first)
+        self.vote(self.first)
+        self.assertTallies(1, 1, 0)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_vote_post_queries(self):
+        """A vote POST read the session, the user and the choice with its question, then write the vote."""
+        with self.assertNumQueries(7):
+            self.vote(self.first)
+        self.assertTallies(1, 1, 0)
+
+    def test_switch_vote(self):
+        """Switching the vote move one from the old choice to the new choice."""
+        self.vote(self.first)
+        self.vote(self.second)
+        self.assertTallies(1, 0, 1)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.second)
+
+    def test_results_show_tally(self):
+        """Results page display the stored tally."""
+        self.vote(self.second)
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, 'Second')
+        self.assertEqual(response.context['question'].choice_set.get(pk=self.second.pk).votes, 1)
+
+
+class CastVoteTests(TestCase):
+    """Test the single statement vote write path."""
+
+    def setUp(self):
+        """Set up user, question and choices for testing."""
+        self.user = User.objects.create_user(username='Marry', password='secret')
+        self.question = create_question(question_text='Vote question.', days=-1)
+        self.first = self.question.choice_set.create(choice_text='First')
+        self.second = self.question.choice_set.create(choice_text='Second')
+
+    def test_one_vote_per_user(self):
+        """Database reject a second vote row of the same user on the same question."""
+        Vote.objects.create(question=self.question, user=self.user, choice=self.first)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(question=self.question, user=self.user, choice=self.second)
+
+    def test_first_vote_queries(self):
+        """First vote insert the row and its event and update both tallies, without a savepoint."""
+        with self.assertNumQueries(4):
+            self.assertTrue(cast_vote(self.question, self.user, self.first))
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.first)
+
+    def test_switch_queries(self):
+        """A switch try the insert, lock and update the vote, insert its event and update both choices."""
+        cast_vote(self.question, self.user, self.first)
+        with self.assertNumQueries(6):
+            self.assertTrue(cast_vote(self.question, self.user, self.second))
+
+    def test_switch_lock_order(self):
+        """A switch update the choice rows in ascending id order, whichever way it goes."""
+        cast_vote(self.question, self.user, self.second)
+        with CaptureQueriesContext(connection) as queries:
+            cast_vote(self.question, self.user, self.first)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "polls_choice"')]
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(updates[0].endswith('"id" = {}'.format(self.first.pk)))
+        self.assertTrue(updates[1].endswith('"id" = {}'.format(self.second.pk)))
+
+    def test_repeat_vote(self):
+        """Repeat vote for the same choice change nothing."""
+        cast_vote(self.question, self.user, self.first)
+        self.assertFalse(cast_vote(self.question, self.user, self.first))
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_without_returning(self):
+        """A database without INSERT ... RETURNING write the vote with get_or_create."""
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False):
+            self.assertTrue(cast_vote(self.question, self.user, self.first))
+            self.assertTrue(cast_vote(self.question, self.user, self.second))
+            self.assertFalse(cast_vote(self.question, self.user, self.second))
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.second)
+
+
+class RecountVotesCommandTests(TestCase):
+    """Test the recount_votes command."""
+
+    def setUp(self):
+        """Set up a question with votes but wrong tallies."""
+        user = User.objects.create_user(username='Marry', password='secret')
+        self.question = create_question(question_text='Vote question.', days=-1)
+        self.choice = self.question.choice_set.create(choice_text='First', votes=5)
+        Vote.objects.create(question=self.question, choice=self.choice, user=user)
+
+    def test_check_report_wrong_tally(self):
+        """--check raise error and does not change the tallies."""
+        with self.assertRaises(CommandError):
+            call_command('recount_votes', '--check', stdout=StringIO())
+        self.assertEqual(Choice.objects.get(pk=self.choice.pk).votes, 5)
+
+    def test_recount_fix_tally(self):
+        """Recount write the counted value back."""
+        call_command('recount_votes', stdout=StringIO())
+        self.assertEqual(Choice.objects.get(pk=self.choice.pk).votes, 1)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).total_votes, 1)
+        call_command('recount_votes', '--check', stdout=StringIO())
@@ -0,0 +1,229 @@
+"""Module for rate limiting and duplicate-submit suppression.
+
+Each limit is a token bucket kept in the Django cache, so every worker see
+the same buckets. A bucket of rate 'N/period' hold up to N tokens and gain
+N tokens every period, a request take one token or is refused with 429.
+
+The bucket is read and written with two cache calls, so concurrent requests
+of one client can now and then both take the last token. That is fine for
+a limiter, the vote write path stay correct on its own.
+"""
+import functools
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+BUCKET_KEY = 'polls:throttle:{}:{}'
+DEDUPE_KEY = 'polls:dedupe:{}:{}:{}'
+IDEMPOTENCY_KEY = 'polls:idempotency:{}:{}'
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600}
+
+DEFAULT_THROTTLE_OPTIONS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'RATES': {
+        'vote_user': '30/min',
+        'vote_ip': '300/min',
+        'login_user': '10/min',
+        'login_ip': '60/min',
+    },
+    'DEDUPE_TTL': 5,
+    'IP_HEADER': 'REMOTE_ADDR',
+}
+
+
+def throttle_options():
+    """Return the throttle options merged over the defaults."""
+    options = {**DEFAULT_THROTTLE_OPTIONS, **getattr(settings, 'POLLS_THROTTLE', {})}
+    options['RATES'] = {**DEFAULT_THROTTLE_OPTIONS['RATES'], **options['RATES']}
+    return options
+
+
+def parse_rate(rate):
+    """Return (tokens, seconds) of a rate like '30/min', None for no limit."""
+    if not rate:
+        return None
+    tokens, period = rate.split('/')
+    return int(tokens), PERIODS.get(period) or float(period)
+
+
+def client_ip(request):
+    """Return the client address from the IP_HEADER of the request."""
+    value = request.META.get(throttle_options()['IP_HEADER'], '')
+    # X-Forwarded-For list the client first.
+    return value.split(',')[0].strip() or 'unknown'
+
+
+def login_ident(request):
+    """Return the login bucket key of the posted username and the client address.
+
+    The username alone would let anyone lock a named user out by failing
+    its logins, so each client address get its own bucket per username.
+    """
+    return '{}@{}'.format(request.POST.get('username', '').lower(), client_ip(request))
+
+
+def _take(bucket, rate, now):
+    """Take one token from the bucket state.
+
+    Args:
+        bucket: (tokens, updated) read from the cache, None for a full bucket.
+        rate: (capacity, period) of the bucket.
+        now: current time in seconds.
+
+    Returns:
+        (new state, seconds to wait), the wait is 0 when the token was taken.
+    """
+    capacity, period = rate
+    tokens, updated = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens < 1:
+        return (tokens, now), (1 - tokens) * period / capacity
+    return (tokens - 1, now), 0
+
+
+def take_token(scope, ident, rate):
+    """Take one token from the bucket of scope and ident.
+
+    Returns:
+        Seconds to wait before retrying, 0 when the request is allowed.
+    """
+    rate = parse_rate(rate)
+    if rate is None:
+        return 0
+    cache = caches[throttle_options()['CACHE']]
+    key = BUCKET_KEY.format(scope, ident)
+    state, wait = _take(cache.get(key), rate, time.time())
+    cache.set(key, state, int(rate[1]) + 1)
+    return wait
+
+
+async def atake_token(scope, ident, rate):
+    """Async version of take_token."""
+    rate = parse_rate(rate)
+    if rate is None:
+        return 0
+    cache = caches[throttle_options()['CACHE']]
+    key = BUCKET_KEY.format(scope, ident)
+    state, wait = _take(await cache.aget(key), rate, time.time())
+    await cache.aset(key, state, int(rate[1]) + 1)
+    return wait
+
+
+def _buckets(scope, request, user_ident):
+    """Return the (scope, ident, rate) of the user and IP buckets of the request."""
+    rates = throttle_options()['RATES']
+    buckets = [(scope + '_ip', client_ip(request), rates.get(scope + '_ip'))]
+    if user_ident:
+        buckets.append((scope + '_user', user_ident, rates.get(scope + '_user')))
+    return buckets
+
+
+def too_many_requests(wait, status=429):
+    """Return the 429 response with the Retry-After header, or 503 when the server is the busy one."""
+    response = HttpResponse('Too many requests, try again later.', status=status, content_type='text/plain')
+    response['Retry-After'] = str(max(1, round(wait)))
+    return response
+
+
+def throttle(scope, user_ident=None):
+    """Decorate a view with the per-IP and per-user token buckets of scope.
+
+    Only POST requests are limited, the RATES are read from scope + '_ip'
+    and scope + '_user'. Works on sync and async views.
+
+    Args:
+        scope: name of the limit, 'vote' or 'login'.
+        user_ident: function of the request returning the user key, the
+            authenticated user id if not given.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method == 'POST' and throttle_options()['ENABLED']:
+                    ident = user_ident(request) if user_ident else (await request.auser()).pk
+                    for bucket in _buckets(scope, request, ident):
+                        wait = await atake_token(*bucket)
+                        if wait:
+                            return too_many_requests(wait)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST' and throttle_options()['ENABLED']:
+                ident = user_ident(request) if user_ident else request.user.pk
+                for bucket in _buckets(scope, request, ident):
+                    wait = take_token(*bucket)
+                    if wait:
+                        return too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _dedupe_keys(request, question_id):
+    """Return the idempotency key and the last-submission key of the vote."""
+    user_id = request.user.pk
+    idempotency = request.headers.get('Idempotency-Key')
+    return (IDEMPOTENCY_KEY.format(user_id, idempotency) if idempotency else None,
+            DEDUPE_KEY.format(user_id, request.session.session_key, question_id))
+
+
+def is_duplicate_vote(request, question_id):
+    """Return True if the vote repeat a submission of the last DEDUPE_TTL seconds.
+
+    A submission is a repeat when it carry an Idempotency-Key already seen
+    for the user, or when it post the same choice as the last vote of the
+    session on the question. A new submission is remembered: the view call
+    forget_vote when it is refused or its write fail, so a retry go through.
+    """
+    options = throttle_options()
+    if not options['ENABLED'] or not options['DEDUPE_TTL']:
+        return False
+    cache = caches[options['CACHE']]
+    idempotency_key, last_key = _dedupe_keys(request, question_id)
+    if idempotency_key and not cache.add(idempotency_key, True, options['DEDUPE_TTL']):
+        return True
+    choice = request.POST.get('choice')
+    if cache.add(last_key, choice, options['DEDUPE_TTL']):
+        return False
+    if cache.get(last_key) == choice:
+        return True
+    cache.set(last_key, choice, options['DEDUPE_TTL'])
+    return False
+
+
+async def ais_duplicate_vote(request, question_id):
+    """Async version of is_duplicate_vote."""
+    options = throttle_options()
+    if not options['ENABLED'] or not options['DEDUPE_TTL']:
+        return False
+    cache = caches[options['CACHE']]
+    idempotency_key, last_key = _dedupe_keys(request, question_id)
+    if idempotency_key and not await cache.aadd(idempotency_key, True, options['DEDUPE_TTL']):
+        return True
+    choice = request.POST.get('choice')
+    if await cache.aadd(last_key, choice, options['DEDUPE_TTL']):
+        return False
+    if await cache.aget(last_key) == choice:
+        return True
+    await cache.aset(last_key, choice, options['DEDUPE_TTL'])
+    return False
+
+
+def forget_vote(request, question_id):
+    """Forget the submission of a vote that was refused, so it can be posted again."""
+    cache = caches[throttle_options()['CACHE']]
+    cache.delete_many([key for key in _dedupe_keys(request, question_id) if key])
+
+
+async def aforget_vote(request, question_id):
+    """Async version of forget_vote."""
+    cache = caches[throttle_options()['CACHE']]
+    await cache.adelete_many([key for key in _dedupe_keys(request, question_id) if key])
@@ -1,16 +1,37 @@
 """Module for match the path with its function."""
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.urls import path
-from . import views
+from . import api, views
+from .fragments import cache_anonymous_page
 
-app_name = 'polls'
-urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path('<int:pk>/', login_required(views.DetailView.as_view(), login_url='polls:login'), name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', login_required(views.vote, login_url='polls:login'), name='vote'),
 
-    path('register/', views.registration_page, name='registration'),
-    path('login/', views.login_page, name='login'),
-    path('logout/', views.logged_out, name='logout'),
-]
+def poll_patterns(poll_views):
+    """Return the url patterns with the index, detail, results and vote views of poll_views and the JSON API."""
+    return [
+        path('', cache_anonymous_page(poll_views.IndexView.as_view()), name='index'),
+        path('<int:pk>/', login_required(poll_views.DetailView.as_view(), login_url='polls:login'), name='detail'),
+        path('<int:pk>/results/', poll_views.ResultsView.as_view(), name='results'),
+        path('<int:pk>/results/export/', views.results_export, name='results_export'),
+        path('<int:pk>/results/live/', views.results_stream, name='results_stream'),
+        path('<int:question_id>/vote/', login_required(poll_views.vote, login_url='polls:login'), name='vote'),
+
+        path('register/', views.registration_page, name='registration'),
+        path('login/', views.login_page, name='login'),
+        path('logout/', views.logged_out, name='logout'),
+
+        path('api/questions/', api.question_list, name='api_questions'),
+        path('api/questions/<int:pk>/', api.question_detail, name='api_question'),
+        path('api/questions/<int:pk>/results/', api.question_results, name='api_results'),
+        path('api/questions/<int:pk>/timeline/', api.question_timeline, name='api_timeline'),
+    ]
+
+
+app_name = 'polls'
+# POLLS_ASYNC_VIEWS serve the poll pages with the async views under ASGI,
+# they are only imported then.
+if getattr(settings, 'POLLS_ASYNC_VIEWS', False):
+    from . import async_views as poll_views
+else:
+    poll_views = views
+urlpatterns = poll_patterns(poll_views)
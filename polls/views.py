@@ -1,31 +1,44 @@
 """Module for controlling the flow in the web application."""
-from django.http import HttpResponseRedirect
+import csv
+import itertools
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.views import generic
-from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth import authenticate, logout, login
 from django.contrib.auth.decorators import login_required
-
-from .models import Question, Choice, Vote
-from .forms import CreateUserForm
-
-import logging
+from django.views.decorators.http import condition
+from django.db.models import Prefetch
+
+from .models import ArchivedVote, Question, Choice
+from .caching import (final_results, get_results, is_final, live_results, patch_final_headers, results_last_modified,
+                      results_version)
+from .voting import cast_vote
+from .live import get_broker, live_options
+from .fragments import question_list
+from .queue import enqueue_vote, ingestion_mode
+from .hashing import HashingBusy
+from .throttling import forget_vote, is_duplicate_vote, login_ident, throttle, too_many_requests
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-formatter = logging.Formatter('%(asctime)s:%(levelname)s:%(name)s:%(message)s')
 
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
-
-logger.addHandler(stream_handler)
+def registration_page(request):
+    """Register page work.
 
+    The form is imported here, so the workers import the user creation
+    form machinery only on the first registration.
+    """
+    from .forms import CreateUserForm
 
-def registration_page(request):
-    """Register page work."""
     form = CreateUserForm()
 
     if request.method == 'POST':
@@ -44,13 +57,19 @@ def registration_page(request):
     return render(request, 'registration/registration.html', context)
 
 
+@throttle('login', user_ident=login_ident)
 def login_page(request):
     """Login page work."""
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
 
-        user = authenticate(request, username=username, password=password)
+        try:
+            user = authenticate(request, username=username, password=password)
+        except HashingBusy:
+            logger.warning('Login refused: Hashing pool busy for {} at {}'.format(username,
+                                                                                request.META.get('REMOTE_ADDR')))
+            return too_many_requests(1, status=503)
         if user is not None:
             login(request, user)
 
@@ -73,19 +92,25 @@ def logged_out(request):
     return redirect('polls:login')
 
 
-class IndexView(generic.ListView):
+class IndexView(generic.TemplateView):
     """The index page views."""
 
     template_name = 'polls/index.html'
-    context_object_name = 'latest_question_list'
 
-    def get_queryset(self):
-        """Return poll period.
+    def get_context_data(self, **kwargs):
+        """Add one page of the published questions.
+
+        The page start after the ``after`` cursor and ``open=1`` keep only
+        the questions that can be voted now. The list is rendered from the
+        cache, only the greeting is rendered for each user.
 
         Returns:
-            Set of choice of question that from the past till now.
+            Context with the HTML of the question list and the open filter.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now()).order_by('-pub_date')[:]
+        context = super().get_context_data(**kwargs)
+        context['open_only'] = bool(self.request.GET.get('open'))
+        context['question_list'] = question_list(context['open_only'], self.request.GET.get('after'))
+        return context
 
 
 class DetailView(generic.DetailView):
@@ -100,7 +125,8 @@ class DetailView(generic.DetailView):
         Returns:
             Set of choice of the question that user's request.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        choices = Prefetch('choice_set', queryset=Choice.objects.order_by('pk'))
+        return Question.objects.published().prefetch_related(choices)
 
 
 class ResultsView(generic.DetailView):
@@ -109,10 +135,155 @@ class ResultsView(generic.DetailView):
     model = Question
     template_name = 'polls/results.html'
 
+    def get(self, request, *args, **kwargs):
+        """Render the results, cacheable by browsers and proxies once the poll closed."""
+        response = super().get(request, *args, **kwargs)
+        if is_final(self.object):
+            patch_final_headers(response, self.object)
+        return response
+
+    def get_context_data(self, **kwargs):
+        """Add the cached results of the question.
+
+        The choices and their votes come from one query, or none on a cache hit.
+        ``final`` is True once the results can no longer change, ``live`` when
+        the page open the live results stream.
+
+        Returns:
+            Context with the results of each choice.
+        """
+        context = super().get_context_data(**kwargs)
+        context['results'] = get_results(self.object)
+        context['final'] = is_final(self.object)
+        context['live'] = live_options()['ENABLED'] and not context['final']
+        return context
+
+class Echo:
+    """File-like object that return what is written, for stream the CSV rows."""
+
+    def write(self, value):
+        """Return the value instead of storing it."""
+        return value
+
+
+def _export_etag(request, pk):
+    """Return the ETag of the results export from the results version."""
+    return '"{}-{}-{}"'.format(pk, results_version(pk), request.GET.urlencode())
+
+
+def _export_last_modified(request, pk):
+    """Return when the results of the question last changed."""
+    return results_last_modified(pk)
+
+
+@condition(etag_func=_export_etag, last_modified_func=_export_last_modified)
+def results_export(request, pk):
+    """Stream the results of the question as CSV or NDJSON.
+
+    ``format`` is 'csv' or 'ndjson' and ``data`` is 'tallies' for the votes of
+    each choice or 'votes' for every vote with its time (staff only). The votes
+    are read with a server-side cursor, so memory stay flat on large polls,
+    archived votes come after the others. The tallies of a closed poll come
+    from its results snapshot and can be kept by browsers and proxies.
+
+    Returns:
+        Streaming response, 304 if the results did not change.
+    """
+    question = get_object_or_404(Question, pk=pk)
+    export_format = request.GET.get('format', 'csv')
+    data = request.GET.get('data', 'tallies')
+    if export_format not in ('csv', 'ndjson') or data not in ('tallies', 'votes'):
+        return HttpResponseBadRequest('format must be csv or ndjson and data must be tallies or votes.')
+    if data == 'votes' and not request.user.is_staff:
+        raise PermissionDenied
+
+    final = data == 'tallies' and is_final(question)
+    if final:
+        header = ('choice_id', 'choice_text', 'votes')
+        rows = ((result['id'], result['choice_text'], result['votes']) for result in final_results(question))
+    elif data == 'tallies':
+        header = ('choice_id', 'choice_text', 'votes')
+        rows = question.choice_set.with_tally().order_by('pk').values_list('id', 'choice_text', 'tally')
+        rows = rows.iterator(chunk_size=2000)
+    else:
+        header = ('vote_id', 'choice_id', 'user_id', 'cast_at')
+        fields = ('id', 'choice_id', 'user_id', 'cast_at')
+        archived = ArchivedVote.objects.filter(question=question).order_by('pk').values_list(*fields)
+        rows = itertools.chain(question.vote_set.order_by('pk').values_list(*fields).iterator(chunk_size=2000),
+                               archived.iterator(chunk_size=2000))
+
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        lines = itertools.chain([writer.writerow(header)], (writer.writerow(row) for row in rows))
+        content_type = 'text/csv'
+    else:
+        lines = (json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+        content_type = 'application/x-ndjson'
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="question-{}-{}.{}"'.format(pk, data, export_format)
+    if final:
+        patch_final_headers(response, question)
+    return response
+
+
+async def results_stream(request, pk):
+    """Push the live results of the question as Server-Sent Events.
+
+    The first event is the snapshot of the results, then every tick with
+    votes send one delta event of the changed choices. Both carry the
+    results version as their event id, the deltas only count the votes
+    after the snapshot version. A comment is sent
+    when nothing happen for KEEPALIVE seconds, so proxies keep the idle
+    connection open.
+
+    The stream is only served under ASGI with POLLS_LIVE['ENABLED']: under
+    WSGI the whole response is read before the first byte is sent, so it
+    would block a worker for good. The 204 tell EventSource not to reconnect.
+
+    Returns:
+        Streaming response of text/event-stream, 204 when live results are off.
+    """
+    if not live_options()['ENABLED'] or not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    try:
+        question = await Question.objects.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404('No question found.')
+    options = live_options()
+    # Subscribe before reading the snapshot so a vote committed in between is
+    # still delivered, the subscription drop the ones the snapshot counted.
+    subscription = get_broker().subscribe(question.pk)
+    version, results = await sync_to_async(live_results)(question)
+    subscription.set_since(version)
+
+    async def events():
+        try:
+            yield 'event: snapshot\nid: {}\ndata: {}\n\n'.format(version, json.dumps(results))
+            while True:
+                deltas = await subscription.get(timeout=options['KEEPALIVE'])
+                if deltas is None:
+                    yield ': keepalive\n\n'
+                elif deltas:
+                    # An empty id mark deltas of unknown version, the client apply them.
+                    delta_id = '' if subscription.version is None else subscription.version
+                    yield 'event: delta\nid: {}\ndata: {}\n\n'.format(delta_id, json.dumps(deltas))
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
+@throttle('vote')
 def vote(request, question_id):
     """Check if question in the period count the vote.
 
+    A repeat of the same submission within POLLS_THROTTLE['DEDUPE_TTL']
+    seconds is sent to the results page without touching the votes.
+
     Args:
         request: user's request.
         question_id: id of question that user request
@@ -120,34 +291,38 @@ def vote(request, question_id):
     Returns: Result page if the choice has check, otherwise detail page.
 
     """
-    question = get_object_or_404(Question, pk=question_id)
-    if question.can_vote():
-        try:
-            select_choice = question.choice_set.get(pk=request.POST['choice'])
-        except (KeyError, Choice.DoesNotExist):
-            return render(request, 'polls/detail.html', {'question': question,
-                                                         'error_message': "You didn't select a choice."})
-        else:
-            if not Vote.objects.filter(question=question, user=request.user).exists():
-                vote = Vote.objects.create(question=question, user=request.user, choice=select_choice)
-                vote.save()
-            elif Vote.objects.filter(question=question, user=request.user).exists():
-                vote = Vote.objects.get(question=question, user=request.user)
-                if vote.choice == select_choice:
-                    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
-                else:
-                    vote.choice = select_choice
-                    vote.save()
-                    logger.info('Vote success: Vote as {} at {}'.format(request.user.username,
-                                                                          request.META.get('REMOTE_ADDR')))
-                    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
-            else:
-                select_choice += 1
-                select_choice.save()
-                # Always return an HttpResponseRedirect after successfully dealing
-                # with POST data. This prevents data from being posted twice if a
-                # user hits the Back button.
-                return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+    if is_duplicate_vote(request, question_id):
+        return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
+    try:
+        # The choice and its question in one query.
+        select_choice = (Choice.objects.select_related('question').defer('question__final_results')
+                         .get(pk=request.POST['choice'], question_id=question_id))
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        select_choice = None
+        question = get_object_or_404(Question, pk=question_id)
     else:
+        question = select_choice.question
+    if not question.can_vote():
+        forget_vote(request, question_id)
         messages.error(request, "This poll was not in the polling period.")
         return redirect('polls:index')
+    if select_choice is None:
+        forget_vote(request, question_id)
+        return render(request, 'polls/detail.html', {'question': question,
+                                                     'error_message': "You didn't select a choice."})
+    try:
+        if ingestion_mode() != 'sync':
+            enqueue_vote(question, request.user, select_choice)
+            logger.info('Vote queued: Vote as {} at {}'.format(request.user.username,
+                                                                 request.META.get('REMOTE_ADDR')))
+        elif cast_vote(question, request.user, select_choice):
+            logger.info('Vote success: Vote as {} at {}'.format(request.user.username,
+                                                                  request.META.get('REMOTE_ADDR')))
+    except Exception:
+        # The vote was not written, a retry must not be taken for a repeat.
+        forget_vote(request, question_id)
+        raise
+    # Always return an HttpResponseRedirect after successfully dealing
+    # with POST data. This prevents data from being posted twice if a
+    # user hits the Back button.
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
@@ -0,0 +1,293 @@
+"""Module for writing votes and keeping the vote tallies in step."""
+import datetime
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .caching import bump_results_version, closed_results_options, final_results, has_final_results, is_final
+from .events import MATERIALIZER, lock_checkpoint, materialize_events
+from .live import publish
+from .models import ArchivedVote, Question, Choice, ChoiceShard, EventTally, Vote, VoteEvent
+
+
+DEFAULT_COUNTER_OPTIONS = {
+    'SHARDS': 0,
+    'PICK': 'random',
+}
+
+
+def counter_options():
+    """Return the counter options merged over the defaults."""
+    return {**DEFAULT_COUNTER_OPTIONS, **getattr(settings, 'POLLS_COUNTERS', {})}
+
+
+def bump_choice(choice_id, delta, user_id=None):
+    """Add delta to the tally of one choice with a single UPDATE.
+
+    With SHARDS set, the UPDATE go to one of the shard rows of the choice,
+    picked at random or, with PICK 'user', from user_id. A missing shard
+    row is created.
+    """
+    options = counter_options()
+    if not options['SHARDS']:
+        Choice.objects.filter(pk=choice_id).update(votes=F('votes') + delta)
+        return
+    if options['PICK'] == 'user' and user_id is not None:
+        shard = user_id % options['SHARDS']
+    else:
+        shard = random.randrange(options['SHARDS'])
+    shards = ChoiceShard.objects.filter(choice_id=choice_id, shard=shard)
+    if shards.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ChoiceShard.objects.create(choice_id=choice_id, shard=shard, count=delta)
+    except IntegrityError:
+        # Another vote created the row first.
+        shards.update(count=F('count') + delta)
+
+
+def bump_choices(deltas, user_id=None):
+    """Add the deltas of each choice id with bump_choice, in ascending choice id order.
+
+    Concurrent writers then lock the choice rows in the same order, so two
+    users switching between the same choices in opposite directions wait
+    for each other instead of deadlocking.
+    """
+    for choice_id in sorted(deltas):
+        if deltas[choice_id]:
+            bump_choice(choice_id, deltas[choice_id], user_id)
+
+
+def bump_question(question_id, delta):
+    """Add delta to the total votes of one question with a single UPDATE.
+
+    With SHARDS set nothing is written: the shards of its choices already
+    hold the new votes, Question.objects.with_tally() add them and
+    compact_counters fold them into total_votes.
+    """
+    if counter_options()['SHARDS']:
+        return
+    Question.objects.filter(pk=question_id).update(total_votes=F('total_votes') + delta)
+
+
+def results_changed(question_id, deltas, using=None):
+    """Invalidate the cached results and push the deltas to live clients after commit.
+
+    Args:
+        question_id: id of the question whose tallies changed.
+        deltas: dict of choice id to the change of its votes.
+        using: database alias of the transaction.
+    """
+    def changed():
+        publish(question_id, deltas, bump_results_version(question_id))
+    transaction.on_commit(changed, using=using)
+
+
+def _insert_vote(using, question, user, choice):
+    """Insert the vote unless user already voted on question.
+
+    Use a single INSERT ... ON CONFLICT DO NOTHING RETURNING on SQLite and
+    PostgreSQL, so concurrent first votes of the same user cannot race each
+    other. SQLite before 3.35 has no RETURNING and use get_or_create.
+
+    Returns:
+        True if the vote was inserted, False if user already has a vote.
+    """
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql') or not connection.features.can_return_columns_from_insert:
+        _, created = Vote.objects.using(using).get_or_create(question=question, user=user,
+                                                             defaults={'choice': choice})
+        return created
+
+    quote = connection.ops.quote_name
+    sql = ('INSERT INTO {table} ({question}, {user}, {choice}, {cast_at}) VALUES (%s, %s, %s, %s) '
+           'ON CONFLICT ({question}, {user}) DO NOTHING RETURNING {pk}').format(
+        table=quote(Vote._meta.db_table),
+        question=quote(Vote._meta.get_field('question').column),
+        user=quote(Vote._meta.get_field('user').column),
+        choice=quote(Vote._meta.get_field('choice').column),
+        cast_at=quote(Vote._meta.get_field('cast_at').column),
+        pk=quote(Vote._meta.pk.column),
+    )
+    cast_at = Vote._meta.get_field('cast_at').get_db_prep_save(timezone.now(), connection)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [question.pk, user.pk, choice.pk, cast_at])
+        return cursor.fetchone() is not None
+
+
+def cast_vote(question, user, choice):
+    """Create or switch the vote of user, append its VoteEvent and update the tallies.
+
+    Args:
+        question: question that user vote on.
+        user: user who vote.
+        choice: choice that user select.
+
+    Returns:
+        True if the vote was created or switched, False if user already voted for this choice.
+    """
+    using = router.db_for_write(Vote)
+    deltas = {choice.pk: 1}
+    # Nothing inside is caught and retried, so inside a request or worker
+    # transaction no savepoint is needed around it.
+    with transaction.atomic(using=using, savepoint=False):
+        event = VoteEvent(question=question, choice=choice, user=user)
+        if _insert_vote(using, question, user, choice):
+            bump_question(question.pk, 1)
+        else:
+            vote = Vote.objects.using(using).select_for_update().only('choice').get(question=question, user=user)
+            if vote.choice_id == choice.pk:
+                return False
+            if vote.choice_id is not None:
+                deltas[vote.choice_id] = -1
+            event.previous_choice_id = vote.choice_id
+            vote.choice = choice
+            vote.cast_at = event.created_at
+            vote.save(update_fields=['choice', 'cast_at'])
+        event.save(using=using)
+        bump_choices(deltas, user.pk)
+        results_changed(question.pk, deltas, using)
+    return True
+
+
+def recount_votes(question=None, fix=True):
+    """Rebuild the vote tallies from the Vote and ArchivedVote rows.
+
+    A fixed question also lose its results snapshot, the next read take it again.
+    The event log is materialized first, then its EventTally rows are checked
+    against the same counts, with the materializer checkpoint locked.
+
+    Args:
+        question: only recount this question if given, otherwise recount every question.
+        fix: write the counted value back if True, otherwise only report it.
+
+    Returns:
+        List of (object, stored, counted) for every tally that was wrong.
+    """
+    questions = Question.objects.all()
+    choices = Choice.objects.all()
+    if question is not None:
+        questions = questions.filter(pk=question.pk)
+        choices = choices.filter(question=question)
+
+    counted = Count('vote', distinct=True) + Count('archivedvote', distinct=True)
+    mismatches = []
+    materialize_events()
+    with transaction.atomic():
+        lock_checkpoint(MATERIALIZER)
+        if fix:
+            # Fold the shards first, then total_votes and votes are the whole tallies.
+            compact_counters(choices)
+        for obj in questions.defer('final_results').with_tally().annotate(counted=counted):
+            if obj.tally != obj.counted:
+                mismatches.append((obj, obj.tally, obj.counted))
+                if fix:
+                    Question.objects.filter(pk=obj.pk).update(total_votes=obj.counted)
+        counts = dict(choices.annotate(counted=counted).values_list('pk', 'counted'))
+        materialized = {tally.pk: tally for tally in EventTally.objects.filter(choice__in=choices)}
+        for obj in choices.with_tally():
+            if obj.tally != counts[obj.pk]:
+                mismatches.append((obj, obj.tally, counts[obj.pk]))
+                if fix:
+                    Choice.objects.filter(pk=obj.pk).update(votes=counts[obj.pk])
+                    Question.objects.filter(pk=obj.question_id).update(final_results=None)
+                    transaction.on_commit(lambda pk=obj.question_id: bump_results_version(pk))
+            tally = materialized.get(obj.pk, EventTally(choice=obj))
+            if tally.votes != counts[obj.pk]:
+                mismatches.append((tally, tally.votes, counts[obj.pk]))
+                if fix:
+                    tally.votes = counts[obj.pk]
+                    tally.save()
+    return mismatches
+
+
+def compact_counters(choices=None):
+    """Fold the counter shards back into Choice.votes and Question.total_votes.
+
+    The shard rows are locked, added to their choice and question and
+    deleted in one transaction, so the tallies read the same before and after.
+
+    Args:
+        choices: only compact the shards of these choices if given.
+
+    Returns:
+        Number of shard rows folded.
+    """
+    with transaction.atomic():
+        shards = ChoiceShard.objects.select_for_update().order_by('pk')
+        if choices is not None:
+            shards = shards.filter(choice__in=choices)
+        shards = list(shards.values_list('pk', 'choice_id', 'count'))
+        totals = Counter()
+        for _, choice_id, count in shards:
+            totals[choice_id] += count
+        questions = Counter()
+        for choice_id, question_id in Choice.objects.filter(pk__in=totals).values_list('pk', 'question_id'):
+            questions[question_id] += totals[choice_id]
+        # Questions then choices, in ascending id order like cast_vote.
+        for question_id, total in sorted(questions.items()):
+            if total:
+                Question.objects.filter(pk=question_id).update(total_votes=F('total_votes') + total)
+        for choice_id, total in sorted(totals.items()):
+            if total:
+                Choice.objects.filter(pk=choice_id).update(votes=F('votes') + total)
+        ChoiceShard.objects.filter(pk__in=[shard[0] for shard in shards]).delete()
+    return len(shards)
+
+
+def finalize_closed_polls():
+    """Take the results snapshot of every closed poll that has none.
+
+    Returns:
+        Number of snapshots taken.
+    """
+    grace = datetime.timedelta(seconds=closed_results_options()['GRACE'])
+    taken = 0
+    for question in Question.objects.filter(end_date__lte=timezone.now() - grace).iterator():
+        if not has_final_results(question):
+            final_results(question)
+            taken += 1
+    return taken
+
+
+def archive_votes(before=None, batch_size=2000):
+    """Move the votes of long closed polls from Vote to ArchivedVote.
+
+    The results of these polls are read from their snapshot, which is taken
+    first, so the hot Vote table only keep the rows that can still change.
+    Each batch is copied and deleted in one transaction.
+
+    Args:
+        before: archive the polls that closed before this time, ARCHIVE_AFTER days ago if not given.
+        batch_size: votes moved per transaction.
+
+    Returns:
+        Number of votes moved.
+    """
+    if before is None:
+        before = timezone.now() - datetime.timedelta(days=closed_results_options()['ARCHIVE_AFTER'])
+    moved = 0
+    question_ids = (Vote.objects.filter(question__end_date__lte=before).order_by()
+                    .values_list('question_id', flat=True).distinct())
+    for question in Question.objects.filter(pk__in=list(question_ids)).order_by('pk'):
+        if not is_final(question):
+            continue
+        final_results(question)
+        while True:
+            with transaction.atomic():
+                rows = list(Vote.objects.filter(question=question).order_by('pk')
+                            .values_list('pk', 'choice_id', 'user_id', 'cast_at')[:batch_size])
+                if not rows:
+                    break
+                ArchivedVote.objects.bulk_create(
+                    ArchivedVote(pk=pk, question_id=question.pk, choice_id=choice_id, user_id=user_id,
+                                 cast_at=cast_at)
+                    for pk, choice_id, user_id, cast_at in rows)
+                Vote.objects.filter(pk__in=[row[0] for row in rows]).delete()
+            moved += len(rows)
+    return moved